@@ -1,142 +1,197 @@
+import html
+import importlib
+import os
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, 
                              QLineEdit, QVBoxLayout, QWidget, 
-                             QFileDialog, QTableWidget, QTableWidgetItem, 
-                             QMessageBox, QGridLayout, QMenuBar, QMenu, QAction, QProgressBar, QComboBox)
-from PyQt5.QtCore import Qt, QTimer
-import qdarkstyle
-
-def importar_excel(archivo):
-    try:
-        df = pd.read_excel(archivo)
-        return df
-    except Exception as e:
-        print(f"Error al importar el archivo: {e}")
-        return None
-
-def exportar_excel(df, archivo):
-    try:
-        df.to_excel(archivo, index=False)
-        print(f"Archivo exportado correctamente a: {archivo}")
-    except Exception as e:
-        print(f"Error al exportar el archivo: {e}")
-
-def determinar_estado(disponibilidad):
-    if disponibilidad < 2:
-        return "CRITICO"
-    elif 2 <= disponibilidad < 3:
-        return "SUB STOCK"
-    elif 3 <= disponibilidad <= 6:
-        return "NORMO STOCK"
-    else:
-        return "SOBRE STOCK"
-
-def calcular_porcentaje_cpa(cpa):
-    try:
-        cpa['cpa'] = pd.to_numeric(cpa['cpa'], errors='coerce')
-        cpa['total'] = pd.to_numeric(cpa['total'], errors='coerce')
-        cpa['ABASTECIMIENTO'] = (cpa['cpa'] / cpa['total']) * 100
-        return cpa
-    except Exception as e:
-        print(f"Error al calcular el porcentaje de CPA: {e}")
-        return cpa
-
-def redistribuir_stock(df, meses, progress_callback):
-    try:
-        df['stock'] = pd.to_numeric(df['stock'], errors='coerce')
-        df['precio'] = pd.to_numeric(df['precio'], errors='coerce')
-        df['disponibilidad'] = pd.to_numeric(df['disponibilidad'], errors='coerce')
-
-        df['original_index'] = df.index
-
-        redistribucion = []
-        total_rows = len(df)
-        processed_rows = 0
-        
-        for micro_red in df['micro red'].unique():
-            df_micro_red = df[df['micro red'] == micro_red]
-
-            for index, row in df_micro_red.iterrows():
-                stock_actual = row['stock']
-                abastecimiento = 0
-                stock_a_recibir = 0
-                stock_reutilizado = 0
-                establecimiento_origen = "NO SE EXTRAE STOCK"
-                establecimiento_destino = "NO SE TRASPASAN STOCK"
-                tipo_medicamento = row['tipo']
-
-                if stock_actual > 0:
-                    for mes in meses:
-                        if mes in df.columns:
-                            salidas = pd.to_numeric(row[mes], errors='coerce')
-                            abastecimiento += salidas
-                            abastecimiento = min(abastecimiento, stock_actual)
-
-                medicamento = row['codigo']
-                otros_establecimientos = df[(
-                    df['codigo'] == medicamento) & 
-                    (df['stock'] > 0) & 
-                    (df['establecimiento'] != row['establecimiento']) & 
-                    (df['tipo'] == tipo_medicamento)
-                ]
-
-                if abastecimiento > 0 and row['establecimiento'] in otros_establecimientos['establecimiento'].values:
-                    stock_reutilizado = min(abastecimiento, stock_actual)
-                    abastecimiento -= stock_reutilizado
-
-                if abastecimiento > 0:
-                    establecimiento_origen = row['establecimiento']
-                    for _, otro_row in otros_establecimientos.iterrows():
-                        stock_disponible = otro_row['stock']
-                        if abastecimiento > 0:
-                            for mes in meses:
-                                if mes in df.columns:
-                                    salidas = pd.to_numeric(row[mes], errors='coerce')
-                                    cantidad_a_recibir = min(salidas, stock_disponible, abastecimiento)
-
-                                    stock_a_recibir += cantidad_a_recibir
-                                    abastecimiento -= cantidad_a_recibir
-                                    establecimiento_destino = otro_row['establecimiento']
-                                    stock_disponible -= cantidad_a_recibir
-
-                stock_total = stock_reutilizado + stock_a_recibir
-                stock_final = stock_actual + stock_a_recibir - abastecimiento
-                disponibilidad = row['disponibilidad']
-                estado = determinar_estado(disponibilidad)
-
-                total = stock_a_recibir * row['precio'] if stock_a_recibir > 0 and pd.notna(row['precio']) else 0
-
-                redistribucion.append({
-                    'MICRO RED': micro_red,
-                    'ESTABLECIMIENTO': row['establecimiento'],
-                    'COD-MEDICAMENTO': row['codigo'],
-                    'MEDICAMENTO': row['medicamentos'],
-                    'PRECIO': row['precio'],
-                    'STOCK ACTUAL': stock_actual if total != 0 else "SC",
-                    'ABASTECIMIENTO': row['cpa'],
-                    'STOCK A RECIBIR': stock_a_recibir if stock_a_recibir > 0 else ("SC" if total == 0 else ""),
-                    'STOCK FINAL': (row['cpa'] + stock_a_recibir) if total != 0 else "SC",
-                    'TOTAL': total,
-                    'ESTABLECIMIENTO DE DONDE SE EXTRAE EL STOCK': establecimiento_origen,
-                    'ESTABLECIMIENTO A DONDE SE TRASPASA EL STOCK': establecimiento_destino if abastecimiento > 0 else "NO SE TRASPASAN STOCK",
-                    'DISPONIBILIDAD': disponibilidad,
-                    'ESTADO': estado,
-                    'original_index': row['original_index']
-                })
-
-                processed_rows += 1
-                progress_callback(int((processed_rows / total_rows) * 100))
-
-        df_redistribuido = pd.DataFrame(redistribucion)
-        df_redistribuido = df_redistribuido.sort_values(by='original_index').reset_index(drop=True)
-        df_redistribuido.drop(columns=['original_index'], inplace=True)
-        
-        return df_redistribuido
-    except Exception as e:
-        print(f"Error al redistribuir el stock: {e}")
-        return None
+                             QFileDialog, QTableView, 
+                             QMessageBox, QGridLayout, QMenuBar, QMenu, QAction, QActionGroup, QProgressBar, QComboBox,
+                             QDialog, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+# Al arrancar solo se importa lo que necesita la ventana; pandas y los
+# módulos de cálculo se cargan en segundo plano (CargaLibreriasWorker) y
+# cada método los importa al usarlos
+from redistribucion.motores import (MOTOR_CLASICO, MOTOR_VECTORIZADO, MOTOR_INDICE,
+                                    MOTOR_PRIORIDAD, MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED,
+                                    solver_disponible)
+from redistribucion.estados import nombres_estados
+from redistribucion.tabla_qt import ModeloTabla
+from redistribucion.perfil import CPROFILE, medir, perfilador_configurado, carpeta_informes
+
+MODULOS_DIFERIDOS = ['redistribucion.excel', 'redistribucion.motor', 'redistribucion.busqueda',
+                     'redistribucion.incremental', 'redistribucion.por_bloques', 'redistribucion.lote']
+
+EXTENSION_POR_FILTRO = {
+    "Archivos Excel (*.xlsx)": ".xlsx",
+    "CSV (*.csv)": ".csv",
+    "Parquet (*.parquet)": ".parquet",
+    "Arrow IPC (*.arrow)": ".arrow",
+}
+FILTROS_EXPORTACION = ";;".join(list(EXTENSION_POR_FILTRO) + ["Todos los archivos (*)"])
+
+class CargaLibreriasWorker(QThread):
+    # Importa pandas y los módulos de cálculo mientras el usuario elige un
+    # archivo. Si pide algo antes de que termine, la importación del método
+    # espera a la de este hilo en lugar de repetirla.
+    terminado = pyqtSignal()
+
+    def run(self):
+        for modulo in MODULOS_DIFERIDOS:
+            try:
+                importlib.import_module(modulo)
+            except Exception as e:
+                print(f"Error al cargar {modulo}: {e}")
+        self.terminado.emit()
+
+class RedistribucionWorker(QThread):
+    progreso = pyqtSignal(int)
+    parcial = pyqtSignal(str, object)
+    terminado = pyqtSignal(object, object)
+    cancelado = pyqtSignal()
+
+    def __init__(self, df, meses, motor, workers=None, anterior=None, perfilador=None, parent=None):
+        super().__init__(parent)
+        self.df = df
+        self.meses = meses
+        self.motor = motor
+        self.workers = workers
+        # (DataFrame, resultado) de la corrida anterior para recalcular solo lo modificado
+        self.anterior = anterior
+        self.perfilador = perfilador
+        self._cancelar = False
+        self._ultimo_progreso = -1
+
+    def cancelar(self):
+        self._cancelar = True
+
+    def run(self):
+        from redistribucion.incremental import redistribuir_incremental
+        from redistribucion.motor import RedistribucionCancelada, redistribuir_stock
+
+        try:
+            # El motor registra sus etapas en la medición activa de este hilo
+            with medir('redistribucion', self.perfilador) as medicion:
+                medicion.datos.update({'filas': len(self.df), 'motor': self.motor,
+                                       'incremental': self.anterior is not None})
+                if self.anterior is not None:
+                    df_anterior, resultado_anterior = self.anterior
+                    df_redistribuido = redistribuir_incremental(df_anterior, resultado_anterior, self.df, self.meses,
+                                                                self._reportar_progreso, motor=self.motor)
+                else:
+                    df_redistribuido = redistribuir_stock(self.df, self.meses, self._reportar_progreso,
+                                                          motor=self.motor, parcial_callback=self._reportar_parcial,
+                                                          workers=self.workers)
+        except RedistribucionCancelada:
+            self.cancelado.emit()
+        else:
+            self.terminado.emit(df_redistribuido, medicion)
+
+    def _reportar_progreso(self, value):
+        # El motor avisa en cada fila; solo se emite cuando cambia el porcentaje
+        if self._cancelar:
+            from redistribucion.motor import RedistribucionCancelada
+            raise RedistribucionCancelada()
+        if value != self._ultimo_progreso:
+            self._ultimo_progreso = value
+            self.progreso.emit(value)
+
+    def _reportar_parcial(self, micro_red, df_parcial):
+        if self._cancelar:
+            from redistribucion.motor import RedistribucionCancelada
+            raise RedistribucionCancelada()
+        self.parcial.emit(str(micro_red), df_parcial)
+
+class ExportacionWorker(QThread):
+    progreso = pyqtSignal(int)
+    terminado = pyqtSignal(bool, str)
+
+    def __init__(self, df, archivo, filas=None, separador=',', parent=None):
+        super().__init__(parent)
+        self.df = df
+        self.archivo = archivo
+        self.filas = filas
+        self.separador = separador
+
+    def run(self):
+        from redistribucion.excel import exportar_excel
+        exportado = exportar_excel(self.df, self.archivo, self.progreso.emit, self.filas, self.separador)
+        self.terminado.emit(exportado, self.archivo)
+
+class PorBloquesWorker(QThread):
+    progreso = pyqtSignal(int)
+    terminado = pyqtSignal(bool, str)
+
+    def __init__(self, entrada, salida, separador=',', parent=None):
+        super().__init__(parent)
+        self.entrada = entrada
+        self.salida = salida
+        self.separador = separador
+
+    def run(self):
+        from redistribucion.por_bloques import redistribuir_por_bloques
+        redistribuido = redistribuir_por_bloques(self.entrada, self.salida, progress_callback=self.progreso.emit,
+                                                 separador=self.separador)
+        self.terminado.emit(redistribuido, self.salida)
+
+class LoteWorker(QThread):
+    avance = pyqtSignal(int, int)
+    archivo_terminado = pyqtSignal(int, object)
+    terminado = pyqtSignal(object)
+
+    def __init__(self, archivos, motor, separador=',', parent=None):
+        super().__init__(parent)
+        self.archivos = archivos
+        self.motor = motor
+        self.separador = separador
+        self._cancelar = False
+
+    def cancelar(self):
+        self._cancelar = True
+
+    def run(self):
+        # Cada libro corre en su propio proceso; aquí solo se esperan los avisos
+        from redistribucion.lote import procesar_lote
+        resultados = procesar_lote(self.archivos, motor=self.motor, separador=self.separador,
+                                   progress_callback=self.avance.emit,
+                                   archivo_callback=self.archivo_terminado.emit,
+                                   cancelado=lambda: self._cancelar)
+        self.terminado.emit(resultados)
+
+class DialogoLote(QDialog):
+    # Un renglón por libro del lote: su avance y cómo terminó
+    def __init__(self, archivos, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Procesando {len(archivos)} libros")
+        self.resize(800, 400)
+        self.tabla = QTableWidget(len(archivos), 3)
+        self.tabla.setHorizontalHeaderLabels(["Libro", "Avance", "Estado"])
+        self.tabla.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.barras = []
+        for fila, archivo in enumerate(archivos):
+            self.tabla.setItem(fila, 0, QTableWidgetItem(os.path.basename(archivo)))
+            self.tabla.item(fila, 0).setToolTip(archivo)
+            barra = QProgressBar()
+            self.tabla.setCellWidget(fila, 1, barra)
+            self.barras.append(barra)
+            self.tabla.setItem(fila, 2, QTableWidgetItem("En espera"))
+        self.tabla.resizeColumnToContents(0)
+        layout = QVBoxLayout()
+        layout.addWidget(self.tabla)
+        self.setLayout(layout)
+
+    def actualizar_avance(self, fila, value):
+        self.barras[fila].setValue(value)
+        self.tabla.item(fila, 2).setText("Procesando")
+
+    def marcar_terminado(self, fila, resultado):
+        from redistribucion.cli import SALIDA_OK
+        if resultado['codigo'] == SALIDA_OK:
+            self.barras[fila].setValue(100)
+            texto = f"OK ({resultado['segundos']:.1f} s): {resultado['salida']}"
+        else:
+            texto = f"Error: {resultado['mensajes'][-1] if resultado['mensajes'] else resultado['codigo']}"
+        self.tabla.item(fila, 2).setText(texto)
+        self.tabla.item(fila, 2).setToolTip("\n".join(resultado['mensajes']))
 
 class App(QMainWindow):
     def __init__(self):
@@ -169,7 +224,7 @@ class App(QMainWindow):
                 border-radius: 4px;
                 font-size: 14px;
             }
-            QTableWidget {
+            QTableView {
                 border: 1px solid #ccc;
                 border-radius: 4px;
                 font-size: 14px;
@@ -183,7 +238,7 @@ class App(QMainWindow):
         self.layout.addWidget(self.boton_importar, 0, 0)
 
         self.boton_exportar = QPushButton("Exportar Excel")
-        self.boton_exportar.clicked.connect(self.exportar_archivo)
+        self.boton_exportar.clicked.connect(lambda: self.exportar_archivo())
         self.layout.addWidget(self.boton_exportar, 0, 1)
 
         self.boton_redistribuir = QPushButton("Redistribuir Stock")
@@ -218,7 +273,7 @@ class App(QMainWindow):
         self.label_buscar_disponibilidad = QLabel("Buscar Disponibilidad:")
         self.layout.addWidget(self.label_buscar_disponibilidad, 4, 0)
         self.combo_buscar_disponibilidad = QComboBox()
-        self.combo_buscar_disponibilidad.addItems(["", "CRITICO", "SUB STOCK", "NORMO STOCK", "SOBRE STOCK"])
+        self.combo_buscar_disponibilidad.addItems([""] + nombres_estados())
         self.layout.addWidget(self.combo_buscar_disponibilidad, 4, 1)
         self.label_rango_disponibilidad = QLabel("Rango de Disponibilidad:")
         self.layout.addWidget(self.label_rango_disponibilidad, 5, 0)
@@ -230,16 +285,26 @@ class App(QMainWindow):
         self.layout.addWidget(self.entry_rango_max, 5, 2)
         self.boton_buscar_disponibilidad = QPushButton("Buscar Disponibilidad")
         self.boton_buscar_disponibilidad.clicked.connect(self.filtrar_disponibilidad)
-        self.layout.addWidget(self.boton_buscar_disponibilidad, 6, 0, 1, 3)
+        self.layout.addWidget(self.boton_buscar_disponibilidad, 6, 0, 1, 2)
+        self.boton_limpiar_filtros = QPushButton("Limpiar Filtros")
+        self.boton_limpiar_filtros.clicked.connect(self.limpiar_filtros)
+        self.layout.addWidget(self.boton_limpiar_filtros, 6, 2)
 
         self.label_info = QLabel("")
         self.layout.addWidget(self.label_info, 7, 0, 1, 3)
 
-        self.table_widget = QTableWidget()
-        self.layout.addWidget(self.table_widget, 8, 0, 1, 3)
+        self.modelo_tabla = ModeloTabla(parent=self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.modelo_tabla)
+        self.layout.addWidget(self.table_view, 8, 0, 1, 3)
 
         self.progress_bar = QProgressBar(self)
-        self.layout.addWidget(self.progress_bar, 9, 0, 1, 3)
+        self.layout.addWidget(self.progress_bar, 9, 0, 1, 2)
+
+        self.boton_cancelar = QPushButton("Cancelar")
+        self.boton_cancelar.clicked.connect(self.cancelar_redistribucion)
+        self.boton_cancelar.setEnabled(False)
+        self.layout.addWidget(self.boton_cancelar, 9, 2)
 
         container = QWidget()
         container.setLayout(self.layout)
@@ -247,6 +312,17 @@ class App(QMainWindow):
 
         self.df = None
         self.df_redistribuido = None
+        self.indices_busqueda = {}
+        # (DataFrame, meses, motor) de la última redistribución terminada y de la que está en curso
+        self.ultima_redistribucion = None
+        self.redistribucion_en_curso = None
+        self.worker = None
+        self.worker_exportacion = None
+        self.worker_lote = None
+        self.worker_carga = None
+        # Tiempos por etapa de la última importación y de la última redistribución
+        self.medicion_importacion = None
+        self.medicion_redistribucion = None
 
         self.crear_menu()
 
@@ -254,28 +330,107 @@ class App(QMainWindow):
         menubar = self.menuBar()
         archivo_menu = menubar.addMenu('Archivo')
 
-        importar_action = QAction('Importar Excel', self)
-        importar_action.triggered.connect(self.importar_archivo)
-        archivo_menu.addAction(importar_action)
-
-        exportar_action = QAction('Exportar Excel', self)
-        exportar_action.triggered.connect(self.exportar_archivo)
-        archivo_menu.addAction(exportar_action)
+        self.importar_action = QAction('Importar Excel', self)
+        self.importar_action.triggered.connect(self.importar_archivo)
+        archivo_menu.addAction(self.importar_action)
+
+        self.exportar_action = QAction('Exportar Excel', self)
+        self.exportar_action.triggered.connect(lambda: self.exportar_archivo())
+        archivo_menu.addAction(self.exportar_action)
+
+        self.exportar_filtradas_action = QAction('Exportar filas filtradas', self)
+        self.exportar_filtradas_action.triggered.connect(self.exportar_filtradas)
+        archivo_menu.addAction(self.exportar_filtradas_action)
+
+        # Para libros que no caben en memoria: el resultado va directo al archivo, sin tabla
+        self.por_bloques_action = QAction('Redistribuir libro grande por bloques...', self)
+        self.por_bloques_action.triggered.connect(self.redistribuir_por_bloques)
+        archivo_menu.addAction(self.por_bloques_action)
+
+        self.lote_action = QAction('Procesar carpeta de libros...', self)
+        self.lote_action.triggered.connect(self.procesar_carpeta)
+        archivo_menu.addAction(self.lote_action)
+
+        opciones_menu = menubar.addMenu('Opciones')
+        motor_menu = opciones_menu.addMenu('Motor de redistribución')
+
+        self.motor_actions = QActionGroup(self)
+        motores = [(MOTOR_VECTORIZADO, 'Vectorizado'),
+                   (MOTOR_INDICE, 'Índice de donantes (descuenta lo entregado)'),
+                   (MOTOR_PRIORIDAD, 'Prioridad por sobrante (primero quien más le sobra)'),
+                   (MOTOR_CLASICO, 'Clásico (fila a fila)'),
+                   (MOTOR_OPTIMO, 'Óptimo (atiende lo máximo posible)'),
+                   (MOTOR_OPTIMO_MICRO_RED, 'Óptimo, prefiere la misma micro red')]
+        for motor, texto in motores:
+            motor_action = QAction(texto, self, checkable=True)
+            motor_action.setData(motor)
+            motor_action.setChecked(motor == MOTOR_VECTORIZADO)
+            # Los motores óptimos necesitan scipy
+            if motor in (MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED) and not solver_disponible():
+                motor_action.setEnabled(False)
+            self.motor_actions.addAction(motor_action)
+            motor_menu.addAction(motor_action)
+
+        self.paralelo_action = QAction(f'Procesamiento paralelo ({os.cpu_count()} núcleos)', self, checkable=True)
+        opciones_menu.addAction(self.paralelo_action)
+
+        self.incremental_action = QAction('Recalcular solo lo modificado al reimportar', self, checkable=True)
+        self.incremental_action.setChecked(True)
+        opciones_menu.addAction(self.incremental_action)
+
+        separador_menu = opciones_menu.addMenu('Separador CSV')
+        self.separador_actions = QActionGroup(self)
+        for separador, texto in [(',', 'Coma (,)'), (';', 'Punto y coma (;)'), ('\t', 'Tabulación')]:
+            separador_action = QAction(texto, self, checkable=True)
+            separador_action.setData(separador)
+            separador_action.setChecked(separador == ',')
+            self.separador_actions.addAction(separador_action)
+            separador_menu.addAction(separador_action)
+
+        limpiar_cache_action = QAction('Limpiar caché de importación', self)
+        limpiar_cache_action.triggered.connect(self.limpiar_cache_importacion)
+        opciones_menu.addAction(limpiar_cache_action)
+
+        opciones_menu.addSeparator()
+        self.tiempos_action = QAction('Tiempos de la última corrida', self)
+        self.tiempos_action.triggered.connect(self.mostrar_tiempos)
+        opciones_menu.addAction(self.tiempos_action)
+
+        # Con el perfilador activo cada corrida guarda su informe en la carpeta de informes
+        self.perfilar_action = QAction('Perfilar corridas (cProfile)', self, checkable=True)
+        self.perfilar_action.setChecked(perfilador_configurado() is not None)
+        opciones_menu.addAction(self.perfilar_action)
+
+    def cargar_librerias(self):
+        # Se llama con la ventana ya visible
+        self.label_info.setText("Cargando librerías de cálculo...")
+        self.worker_carga = CargaLibreriasWorker(self)
+        self.worker_carga.terminado.connect(self.librerias_cargadas)
+        self.worker_carga.finished.connect(self.worker_carga.deleteLater)
+        self.worker_carga.start()
+
+    def librerias_cargadas(self):
+        self.worker_carga = None
+        if self.label_info.text() == "Cargando librerías de cálculo...":
+            self.label_info.setText("")
 
     def importar_archivo(self):
         archivo, _ = QFileDialog.getOpenFileName(self, "Abrir Archivo Excel", "", "Archivos Excel (*.xlsx);;Todos los archivos (*)")
         if archivo:
+            from redistribucion.excel import COLUMNAS_REQUERIDAS, importar_excel
+            from redistribucion.motor import calcular_porcentaje_cpa
             try:
-                self.df = importar_excel(archivo)
+                with medir('importacion') as medicion:
+                    medicion.datos['archivo'] = archivo
+                    self.df = importar_excel(archivo)
+                self.medicion_importacion = medicion
                 if self.df is not None:
                     self.df.columns = self.df.columns.str.lower()
 
-                    required_columns = ['micro red', 'codigo_est', 'establecimiento', 'codigo', 
-                                        'medicamentos', 'precio', 'siga', 'tipo', 
-                                        'petitorio', 'estrategico', 'stock', 
-                                        'total', 'cant_sin_ceros', 'cpa', 'disponibilidad']
+                    required_columns = COLUMNAS_REQUERIDAS
                     missing_columns = [col for col in required_columns if col not in self.df.columns]
                     extra_columns = [col for col in self.df.columns if col not in required_columns]
+                    extra_columns += [col.lower() for col in self.df.attrs.get('columnas_descartadas', [])]
 
                     if not missing_columns:
                         self.label_info.setText(f"Archivo '{archivo}' importado correctamente.")
@@ -283,6 +438,16 @@ class App(QMainWindow):
                         missing_columns_str = ', '.join(missing_columns)
                         self.label_info.setText(f"Faltan las columnas: {missing_columns_str}")
 
+                    errores_conversion = self.df.attrs.get('errores_conversion', {})
+                    if errores_conversion:
+                        cantidad = sum(fallidos for fallidos, _ in errores_conversion.values())
+                        self.label_info.setText(f"{self.label_info.text()} {cantidad} valores no numéricos quedaron vacíos en: {', '.join(errores_conversion)}.")
+
+                    salidas_negativas = self.df.attrs.get('salidas_negativas', {})
+                    if salidas_negativas:
+                        cantidad = sum(salidas_negativas.values())
+                        self.label_info.setText(f"{self.label_info.text()} {cantidad} salidas negativas se tomaron como 0 en: {', '.join(salidas_negativas)}.")
+
                     if extra_columns:
                         extra_columns_str = ', '.join(extra_columns)
                         print(f"Columnas adicionales encontradas: {extra_columns_str}")
@@ -293,45 +458,218 @@ class App(QMainWindow):
                     print(f"Sugerencias de columnas adicionales: {suggested_columns_str}")
 
                     # Calcular porcentaje de CPA
-                    self.df = calcular_porcentaje_cpa(self.df)
+                    with medicion.etapa('porcentaje cpa'):
+                        self.df = calcular_porcentaje_cpa(self.df)
 
             except Exception as e:
                 self.label_info.setText("Error al importar el archivo.")
                 print(f"Error: {e}")
 
-    def exportar_archivo(self):
+    def limpiar_cache_importacion(self):
+        from redistribucion.cache import limpiar_cache
+        eliminados = limpiar_cache()
+        self.label_info.setText(f"Caché de importación limpiada ({eliminados} archivos).")
+
+    def exportar_archivo(self, filas=None):
         if self.df_redistribuido is not None:
-            archivo, _ = QFileDialog.getSaveFileName(self, "Guardar Archivo Excel", "", "Archivos Excel (*.xlsx);;Todos los archivos (*)")
+            archivo, filtro = QFileDialog.getSaveFileName(self, "Guardar Archivo", "", FILTROS_EXPORTACION)
             if archivo:
-                exportar_excel(self.df_redistribuido, archivo)
-                self.label_info.setText(f"Archivo exportado correctamente a: {archivo}")
+                # Sin extensión escrita, se usa la del tipo elegido en el diálogo
+                if not os.path.splitext(archivo)[1] and filtro in EXTENSION_POR_FILTRO:
+                    archivo += EXTENSION_POR_FILTRO[filtro]
+                separador = self.separador_actions.checkedAction().data()
+                self.worker_exportacion = ExportacionWorker(self.df_redistribuido, archivo, filas, separador, self)
+                self.worker_exportacion.progreso.connect(self.update_progress)
+                self.worker_exportacion.terminado.connect(self.exportacion_terminada)
+                self.worker_exportacion.finished.connect(self.worker_exportacion.deleteLater)
+                self.establecer_ocupado(True, cancelable=False)
+                self.progress_bar.setValue(0)
+                self.label_info.setText("Exportando...")
+                self.worker_exportacion.start()
         else:
             self.label_info.setText("No hay ningún DataFrame de redistribución cargado.")
 
+    def redistribuir_por_bloques(self):
+        entrada, _ = QFileDialog.getOpenFileName(self, "Abrir Archivo Excel", "", "Archivos Excel (*.xlsx);;Todos los archivos (*)")
+        if not entrada:
+            return
+        filtros = ";;".join(["Archivos Excel (*.xlsx)", "CSV (*.csv)"])
+        salida, filtro = QFileDialog.getSaveFileName(self, "Guardar Resultado", "", filtros)
+        if salida:
+            if not os.path.splitext(salida)[1] and filtro in EXTENSION_POR_FILTRO:
+                salida += EXTENSION_POR_FILTRO[filtro]
+            separador = self.separador_actions.checkedAction().data()
+            self.worker_exportacion = PorBloquesWorker(entrada, salida, separador, self)
+            self.worker_exportacion.progreso.connect(self.update_progress)
+            self.worker_exportacion.terminado.connect(self.por_bloques_terminado)
+            self.worker_exportacion.finished.connect(self.worker_exportacion.deleteLater)
+            self.establecer_ocupado(True, cancelable=False)
+            self.progress_bar.setValue(0)
+            self.label_info.setText(f"Redistribuyendo '{entrada}' por bloques (motor vectorizado)...")
+            self.worker_exportacion.start()
+
+    def por_bloques_terminado(self, redistribuido, salida):
+        self.worker_exportacion = None
+        self.establecer_ocupado(False)
+        if redistribuido:
+            self.label_info.setText(f"Libro redistribuido por bloques en: {salida}")
+        else:
+            self.label_info.setText("Error al redistribuir el libro por bloques.")
+
+    def procesar_carpeta(self):
+        # Importa, redistribuye y exporta cada libro de la carpeta con el
+        # motor elegido; los resultados quedan al lado de cada libro
+        carpeta = QFileDialog.getExistingDirectory(self, "Carpeta con los libros")
+        if not carpeta:
+            return
+        from redistribucion.lote import archivos_del_lote
+        archivos = archivos_del_lote(carpeta)
+        if not archivos:
+            self.label_info.setText(f"No hay libros Excel en '{carpeta}'.")
+            return
+        motor = self.motor_actions.checkedAction().data()
+        separador = self.separador_actions.checkedAction().data()
+        self.avance_lote = [0] * len(archivos)
+        self.dialogo_lote = DialogoLote(archivos, self)
+        self.worker_lote = LoteWorker(archivos, motor, separador, self)
+        self.worker_lote.avance.connect(self.dialogo_lote.actualizar_avance)
+        self.worker_lote.avance.connect(self.avance_lote_actualizado)
+        self.worker_lote.archivo_terminado.connect(self.dialogo_lote.marcar_terminado)
+        self.worker_lote.archivo_terminado.connect(lambda fila, resultado: self.avance_lote_actualizado(fila, 100))
+        self.worker_lote.terminado.connect(self.lote_terminado)
+        self.worker_lote.finished.connect(self.worker_lote.deleteLater)
+        self.establecer_ocupado(True)
+        self.progress_bar.setValue(0)
+        self.label_info.setText(f"Procesando {len(archivos)} libros de '{carpeta}'...")
+        self.dialogo_lote.show()
+        self.worker_lote.start()
+
+    def avance_lote_actualizado(self, fila, value):
+        self.avance_lote[fila] = value
+        self.progress_bar.setValue(sum(self.avance_lote) // len(self.avance_lote))
+
+    def lote_terminado(self, resultados):
+        self.worker_lote = None
+        self.establecer_ocupado(False)
+        self.progress_bar.setValue(100)
+        from redistribucion.cli import SALIDA_OK
+        correctos = sum(resultado['codigo'] == SALIDA_OK for resultado in resultados)
+        self.label_info.setText(f"{correctos} de {len(resultados)} libros procesados correctamente.")
+
+    def exportar_filtradas(self):
+        self.exportar_archivo(self.modelo_tabla.filas_visibles())
+
+    def exportacion_terminada(self, exportado, archivo):
+        self.worker_exportacion = None
+        self.establecer_ocupado(False)
+        if exportado:
+            self.label_info.setText(f"Archivo exportado correctamente a: {archivo}")
+        else:
+            self.label_info.setText("Error al exportar el archivo.")
+
     def redistribuir_columna(self):
         if self.df is not None:
-            meses = ['setiembre', 'octubre', 'noviembre', 'diciembre', 
-                     'enero', 'febrero', 'marzo', 'abril', 
-                     'mayo', 'junio', 'julio', 'agosto']
-            existing_months = [mes for mes in meses if mes in self.df.columns]
+            from redistribucion.excel import MESES
+            existing_months = [mes for mes in MESES if mes in self.df.columns]
             if existing_months:
-                self.df_redistribuido = redistribuir_stock(self.df, existing_months, self.update_progress)
-                if self.df_redistribuido is not None:
-                    self.label_info.setText("Stock redistribuido correctamente.")
-                    self.table_widget.setRowCount(0)
-                    self.table_widget.setColumnCount(len(self.df_redistribuido.columns))
-                    self.table_widget.setHorizontalHeaderLabels(self.df_redistribuido.columns)
-
-                    for _, row in self.df_redistribuido.iterrows():
-                        row_position = self.table_widget.rowCount()
-                        self.table_widget.insertRow(row_position)
-                        for column, value in enumerate(row):
-                            self.table_widget.setItem(row_position, column, QTableWidgetItem(str(value)))
-
-                else:
-                    self.label_info.setText("Error al redistribuir el stock.")
+                motor = self.motor_actions.checkedAction().data()
+                workers = os.cpu_count() if self.paralelo_action.isChecked() else None
+                anterior = None
+                if (self.incremental_action.isChecked() and self.ultima_redistribucion is not None
+                        and self.df_redistribuido is not None
+                        and self.ultima_redistribucion[1:] == (existing_months, motor)):
+                    anterior = (self.ultima_redistribucion[0], self.df_redistribuido)
+                self.redistribucion_en_curso = (self.df, existing_months, motor)
+                perfilador = CPROFILE if self.perfilar_action.isChecked() else None
+                self.worker = RedistribucionWorker(self.df, existing_months, motor, workers, anterior, perfilador, self)
+                self.worker.progreso.connect(self.update_progress)
+                self.worker.parcial.connect(self.mostrar_parcial)
+                self.worker.terminado.connect(self.redistribucion_terminada)
+                self.worker.cancelado.connect(self.redistribucion_cancelada)
+                self.worker.finished.connect(self.worker.deleteLater)
+                self.establecer_ocupado(True)
+                self.progress_bar.setValue(0)
+                self.label_info.setText("Redistribuyendo stock...")
+                self.worker.start()
             else:
                 self.label_info.setText("No hay meses válidos para redistribuir el stock.")
+
+    def cancelar_redistribucion(self):
+        if self.worker is not None:
+            self.worker.cancelar()
+            self.boton_cancelar.setEnabled(False)
+            self.label_info.setText("Cancelando redistribución...")
+        if self.worker_lote is not None:
+            # Los libros en curso terminan; los que esperan no empiezan
+            self.worker_lote.cancelar()
+            self.boton_cancelar.setEnabled(False)
+            self.label_info.setText("Cancelando los libros que todavía no empezaron...")
+
+    def mostrar_parcial(self, micro_red, df_parcial):
+        self.label_info.setText(f"Micro red '{micro_red}' redistribuida ({len(df_parcial)} filas).")
+
+    def redistribucion_terminada(self, df_redistribuido, medicion):
+        self.worker = None
+        self.worker_exportacion = None
+        self.establecer_ocupado(False)
+        self.df_redistribuido = df_redistribuido
+        self.ultima_redistribucion = self.redistribucion_en_curso if df_redistribuido is not None else None
+        self.medicion_redistribucion = medicion
+        if self.df_redistribuido is not None:
+            from redistribucion.busqueda import IndiceBusqueda
+            with medicion.etapa('índices de búsqueda'):
+                self.indices_busqueda = {columna: IndiceBusqueda(self.df_redistribuido[columna])
+                                         for columna in ('ESTABLECIMIENTO', 'MEDICAMENTO')}
+            with medicion.etapa('mostrar tabla'):
+                self.mostrar_tabla(self.df_redistribuido)
+            texto = f"Stock redistribuido correctamente en {medicion.total():.2f} s ({medicion.resumen()})."
+            if medicion.perfilador is not None:
+                informe = medicion.guardar_en_carpeta()
+                if informe:
+                    texto += f" Informe: {informe}"
+            self.label_info.setText(texto)
+        else:
+            self.label_info.setText("Error al redistribuir el stock.")
+
+    def mostrar_tiempos(self):
+        mediciones = [medicion for medicion in (self.medicion_importacion, self.medicion_redistribucion)
+                      if medicion is not None]
+        if not mediciones:
+            QMessageBox.information(self, "Tiempos", "Todavía no hay ninguna corrida medida.")
+            return
+        tablas = [f"{medicion.nombre} ({', '.join(f'{clave}: {valor}' for clave, valor in medicion.datos.items())})\n"
+                  f"{medicion.tabla()}" for medicion in mediciones]
+        texto = "\n\n".join(tablas)
+        if self.perfilar_action.isChecked():
+            texto += f"\n\nInformes en: {carpeta_informes()}"
+        QMessageBox.information(self, "Tiempos de la última corrida", f"<pre>{html.escape(texto)}</pre>")
+
+    def redistribucion_cancelada(self):
+        self.worker = None
+        self.worker_exportacion = None
+        self.establecer_ocupado(False)
+        self.progress_bar.setValue(0)
+        self.label_info.setText("Redistribución cancelada.")
+
+    def establecer_ocupado(self, ocupado, cancelable=True):
+        controles = [self.boton_importar, self.boton_exportar, self.boton_redistribuir,
+                     self.combo_buscar_micro_red, self.boton_buscar_micro_red,
+                     self.entry_buscar_establecimiento, self.boton_buscar_establecimiento,
+                     self.entry_buscar_medicamento, self.boton_buscar_medicamento,
+                     self.combo_buscar_disponibilidad, self.entry_rango_min, self.entry_rango_max,
+                     self.boton_buscar_disponibilidad, self.boton_limpiar_filtros, self.table_view,
+                     self.importar_action, self.exportar_action, self.exportar_filtradas_action,
+                     self.por_bloques_action, self.lote_action]
+        for control in controles:
+            control.setEnabled(not ocupado)
+        self.boton_cancelar.setEnabled(ocupado and cancelable)
+
+    def mostrar_tabla(self, df):
+        from redistribucion.motor import COLUMNA_SIN_CAMBIO, COLUMNAS_STOCK, MARCA_SIN_CAMBIO
+        columnas = [columna for columna in df.columns if columna != COLUMNA_SIN_CAMBIO]
+        textos_nulos = {columna: MARCA_SIN_CAMBIO for columna in COLUMNAS_STOCK}
+        sin_cambio = df[COLUMNA_SIN_CAMBIO].to_numpy(dtype=bool) if COLUMNA_SIN_CAMBIO in df.columns else None
+        self.modelo_tabla.set_dataframe(df, columnas, textos_nulos, sin_cambio)
     
     def filtrar_micro_red(self):
         self.filtrar_tabla('MICRO RED', self.combo_buscar_micro_red.currentText())
@@ -348,7 +686,7 @@ class App(QMainWindow):
         rango_max = self.entry_rango_max.text()
 
         if estado:
-            self.filtrar_tabla('ESTADO', estado)
+            self.filtrar_estado(estado)
         elif rango_min and rango_max:
             try:
                 rango_min = float(rango_min)
@@ -357,55 +695,69 @@ class App(QMainWindow):
             except ValueError:
                 QMessageBox.warning(self, "Error de entrada", "Por favor, ingrese valores numéricos válidos para el rango de disponibilidad.")
 
-    def filtrar_rango_disponibilidad(self, rango_min, rango_max):
+    def filtrar_estado(self, estado):
+        # Igualdad exacta: un nombre configurado puede estar contenido en otro
+        # ("BAJO" y "MUY BAJO") o llevar caracteres especiales de regex
         if self.df_redistribuido is not None:
-            filtrado = self.df_redistribuido[(self.df_redistribuido['DISPONIBILIDAD'] >= rango_min) & (self.df_redistribuido['DISPONIBILIDAD'] <= rango_max)]
+            self.aplicar_filtro((self.df_redistribuido['ESTADO'] == estado).to_numpy())
+        else:
+            self.label_info.setText("No hay datos disponibles para filtrar.")
 
-            if filtrado.empty:
-                QMessageBox.information(self, "Resultado de búsqueda", "No se encontró.")
-                self.table_widget.setRowCount(0)
-            else:
-                self.table_widget.setRowCount(0)
-                self.table_widget.setColumnCount(len(filtrado.columns))
-                self.table_widget.setHorizontalHeaderLabels(filtrado.columns)
-
-                for _, row in filtrado.iterrows():
-                    row_position = self.table_widget.rowCount()
-                    self.table_widget.insertRow(row_position)
-                    for column, value in enumerate(row):
-                        self.table_widget.setItem(row_position, column, QTableWidgetItem(str(value)))
+    def filtrar_rango_disponibilidad(self, rango_min, rango_max):
+        if self.df_redistribuido is not None:
+            disponibilidad = self.df_redistribuido['DISPONIBILIDAD']
+            self.aplicar_filtro((disponibilidad >= rango_min) & (disponibilidad <= rango_max))
         else:
             self.label_info.setText("No hay datos disponibles para filtrar.")
 
     def filtrar_tabla(self, columna, valor):
         if self.df_redistribuido is not None:
             if isinstance(valor, str):
-                filtrado = self.df_redistribuido[self.df_redistribuido[columna].str.contains(valor, na=False, case=False)]
-            else:
-                filtrado = self.df_redistribuido[self.df_redistribuido[columna] == valor]
-
-            if filtrado.empty:
-                QMessageBox.information(self, "Resultado de búsqueda", "No se encontró.")
-                self.table_widget.setRowCount(0)
+                if not valor:
+                    self.limpiar_filtros()
+                    return
+                if columna in self.indices_busqueda:
+                    mascara = self.indices_busqueda[columna].buscar(valor)
+                else:
+                    mascara = self.df_redistribuido[columna].str.contains(valor, na=False, case=False)
             else:
-                self.table_widget.setRowCount(0)
-                self.table_widget.setColumnCount(len(filtrado.columns))
-                self.table_widget.setHorizontalHeaderLabels(filtrado.columns)
-
-                for _, row in filtrado.iterrows():
-                    row_position = self.table_widget.rowCount()
-                    self.table_widget.insertRow(row_position)
-                    for column, value in enumerate(row):
-                        self.table_widget.setItem(row_position, column, QTableWidgetItem(str(value)))
+                mascara = self.df_redistribuido[columna] == valor
+            self.aplicar_filtro(mascara)
         else:
             self.label_info.setText("No hay datos disponibles para filtrar.")
 
+    def aplicar_filtro(self, mascara):
+        import numpy as np
+        mascara = np.asarray(mascara, dtype=bool)
+        self.modelo_tabla.filtrar(mascara)
+        if not mascara.any():
+            QMessageBox.information(self, "Resultado de búsqueda", "No se encontró.")
+
+    def limpiar_filtros(self):
+        self.modelo_tabla.limpiar_filtro()
+
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancelar()
+            self.worker.wait()
+        if self.worker_exportacion is not None:
+            self.worker_exportacion.wait()
+        if self.worker_lote is not None:
+            self.worker_lote.cancelar()
+            self.worker_lote.wait()
+        if self.worker_carga is not None:
+            self.worker_carga.wait()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = App()
     window.show()
+    import qdarkstyle
     app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
+    # La carga empieza cuando la ventana ya se pintó
+    QTimer.singleShot(0, window.cargar_librerias)
     sys.exit(app.exec_())
\ No newline at end of file
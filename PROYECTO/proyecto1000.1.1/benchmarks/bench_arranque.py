@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+CARPETA_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Lo que la ventana no debe importar antes de mostrarse: se carga en segundo plano
+MODULOS_PESADOS = ['pandas', 'numpy', 'matplotlib', 'scipy', 'pyarrow', 'openpyxl', 'qdarkstyle']
+REPETICIONES = 5
+MODULOS_EN_INFORME = 10
+
+
+def tiempos_de_importacion(modulo):
+    # Microsegundos acumulados de cada módulo que carga `import modulo` en
+    # un intérprete nuevo, según -X importtime
+    entorno = dict(os.environ, QT_QPA_PLATFORM='offscreen',
+                   PYTHONPATH=os.pathsep.join(filter(None, [CARPETA_PROYECTO, os.environ.get('PYTHONPATH')])))
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                            capture_output=True, text=True, cwd=CARPETA_PROYECTO, env=entorno, check=True)
+    tiempos = {}
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        if acumulado.strip().isdigit():
+            tiempos[nombre.strip()] = int(acumulado)
+    return tiempos
+
+
+def _informe(tiempos):
+    mayores = sorted(tiempos.items(), key=lambda item: item[1], reverse=True)[:MODULOS_EN_INFORME]
+    return "\n".join(f"{microsegundos / 1000:9.1f} ms  {nombre}" for nombre, microsegundos in mayores)
+
+
+def test_arranque_sin_modulos_pesados():
+    tiempos = tiempos_de_importacion('alenuevo')
+    pesados = sorted({nombre.split('.')[0] for nombre in tiempos} & set(MODULOS_PESADOS))
+    assert not pesados, f"alenuevo importa al arrancar: {', '.join(pesados)}\n{_informe(tiempos)}"
+
+
+def test_presupuesto_de_arranque(presupuesto_arranque):
+    # El mejor de varios intérpretes nuevos: el primero además compila los .pyc
+    mediciones = [tiempos_de_importacion('alenuevo') for _ in range(REPETICIONES)]
+    tiempos = min(mediciones, key=lambda tiempos: tiempos['alenuevo'])
+    milisegundos = tiempos['alenuevo'] / 1000
+    print(f"\nimport alenuevo: {milisegundos:.1f} ms (presupuesto {presupuesto_arranque:.0f} ms)\n{_informe(tiempos)}")
+    assert milisegundos <= presupuesto_arranque, \
+        f"import alenuevo tardó {milisegundos:.1f} ms, más que {presupuesto_arranque:.0f} ms\n{_informe(tiempos)}"
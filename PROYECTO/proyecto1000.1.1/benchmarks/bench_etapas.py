@@ -0,0 +1,69 @@
+import pytest
+
+from benchmarks.comun import rondas, sin_progreso
+from redistribucion.cache import cache_disponible
+from redistribucion.excel import MESES, exportar_excel, importar_excel
+from redistribucion.motor import (COLUMNA_SIN_CAMBIO, COLUMNAS_STOCK, MARCA_SIN_CAMBIO, MOTOR_CLASICO,
+                                  MOTOR_INDICE, MOTOR_PRIORIDAD, MOTOR_VECTORIZADO, redistribuir_stock)
+
+pytest.importorskip("pytest_benchmark")
+
+# El bucle clásico recorre fila a fila: solo se mide en libros chicos
+MAXIMO_FILAS_CLASICO = 1_000
+
+
+def test_importar_excel(benchmark, archivo_xlsx, filas):
+    df = benchmark.pedantic(importar_excel, args=(archivo_xlsx, False), rounds=rondas(filas), iterations=1)
+    assert len(df) == filas
+
+
+def test_importar_desde_cache(benchmark, archivo_xlsx, filas, carpeta_cache):
+    if not cache_disponible():
+        pytest.skip("la caché necesita pyarrow")
+    importar_excel(archivo_xlsx)
+    df = benchmark.pedantic(importar_excel, args=(archivo_xlsx,), rounds=rondas(filas), iterations=1)
+    assert len(df) == filas
+
+
+@pytest.mark.parametrize("motor", [MOTOR_VECTORIZADO, MOTOR_INDICE, MOTOR_PRIORIDAD, MOTOR_CLASICO])
+def test_redistribuir_stock(benchmark, df_importado, filas, motor):
+    if motor == MOTOR_CLASICO and filas > MAXIMO_FILAS_CLASICO:
+        pytest.skip("el motor clásico es fila a fila")
+
+    def preparar():
+        # Cada ronda recibe su copia: el motor agrega columnas al DataFrame
+        return (df_importado.copy(), MESES, sin_progreso), {'motor': motor}
+
+    repeticiones = 3 if motor == MOTOR_CLASICO else rondas(filas)
+    df_redistribuido = benchmark.pedantic(redistribuir_stock, setup=preparar, rounds=repeticiones, iterations=1)
+    assert df_redistribuido is not None
+
+
+@pytest.mark.parametrize("extension", [".xlsx", ".csv", ".parquet"])
+def test_exportar_excel(benchmark, resultado, filas, extension, tmp_path):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    archivo = str(tmp_path / f"salida{extension}")
+    exportado = benchmark.pedantic(exportar_excel, args=(resultado, archivo), rounds=rondas(filas), iterations=1)
+    assert exportado
+
+
+def test_poblar_tabla(benchmark, resultado, filas):
+    # Lo que hace App.mostrar_tabla al terminar la redistribución, más las
+    # celdas de la primera pantalla que pide la vista
+    QtCore = pytest.importorskip("PyQt5.QtCore")
+    from redistribucion.tabla_qt import ModeloTabla
+
+    aplicacion = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    modelo = ModeloTabla()
+    columnas = [columna for columna in resultado.columns if columna != COLUMNA_SIN_CAMBIO]
+    textos_nulos = {columna: MARCA_SIN_CAMBIO for columna in COLUMNAS_STOCK}
+
+    def poblar():
+        modelo.set_dataframe(resultado, columnas, textos_nulos)
+        for fila in range(min(50, modelo.rowCount())):
+            for columna in range(modelo.columnCount()):
+                modelo.data(modelo.index(fila, columna))
+
+    benchmark.pedantic(poblar, rounds=rondas(filas), iterations=1)
+    assert modelo.rowCount() == len(resultado) and aplicacion is not None
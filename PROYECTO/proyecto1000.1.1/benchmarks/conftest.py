@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from benchmarks.comun import sin_progreso
+from benchmarks.generador import ESCALAS, generar_filas
+from redistribucion.excel import MESES, importar_excel
+from redistribucion.motor import calcular_porcentaje_cpa, redistribuir_stock
+
+TAMANOS_POR_DEFECTO = "1000,10000,100000"
+# Lo que puede tardar `import alenuevo` antes de que aparezca la ventana
+PRESUPUESTO_ARRANQUE_MS = 250
+
+
+def pytest_addoption(parser):
+    parser.addoption("--tamanos", default=TAMANOS_POR_DEFECTO,
+                     help=f"Filas a medir separadas por coma, o 'todos' ({', '.join(map(str, ESCALAS))}).")
+    parser.addoption("--presupuesto-arranque", type=float, default=PRESUPUESTO_ARRANQUE_MS,
+                     help=f"Milisegundos que puede tardar importar alenuevo (por defecto {PRESUPUESTO_ARRANQUE_MS}).")
+
+
+def pytest_generate_tests(metafunc):
+    if "filas" in metafunc.fixturenames:
+        tamanos = metafunc.config.getoption("--tamanos")
+        filas = sorted(ESCALAS) if tamanos == "todos" else [int(valor) for valor in tamanos.split(",")]
+        metafunc.parametrize("filas", filas, scope="session")
+
+
+@pytest.fixture(scope="session")
+def presupuesto_arranque(request):
+    return request.config.getoption("--presupuesto-arranque")
+
+
+@pytest.fixture(scope="session")
+def libro(filas):
+    return generar_filas(filas)
+
+
+@pytest.fixture(scope="session")
+def archivo_xlsx(libro, filas, tmp_path_factory):
+    archivo = str(tmp_path_factory.mktemp("libros") / f"libro_{filas}.xlsx")
+    libro.to_excel(archivo, index=False)
+    return archivo
+
+
+@pytest.fixture(scope="session")
+def df_importado(archivo_xlsx):
+    df = importar_excel(archivo_xlsx, usar_cache=False)
+    df.columns = df.columns.str.lower()
+    return calcular_porcentaje_cpa(df)
+
+
+@pytest.fixture(scope="session")
+def resultado(df_importado):
+    return redistribuir_stock(df_importado.copy(), MESES, sin_progreso)
+
+
+@pytest.fixture(scope="session")
+def carpeta_cache(tmp_path_factory):
+    carpeta = str(tmp_path_factory.mktemp("cache"))
+    anterior = os.environ.get("REDISTRIBUCION_CACHE")
+    os.environ["REDISTRIBUCION_CACHE"] = carpeta
+    yield carpeta
+    if anterior is None:
+        os.environ.pop("REDISTRIBUCION_CACHE", None)
+    else:
+        os.environ["REDISTRIBUCION_CACHE"] = anterior
@@ -0,0 +1,124 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from redistribucion.esquema import COLUMNAS_REQUERIDAS, MESES
+
+# Filas aproximadas -> (micro redes, establecimientos por micro red, medicamentos)
+ESCALAS = {
+    1_000: (2, 5, 100),
+    10_000: (4, 10, 250),
+    100_000: (10, 20, 500),
+    1_000_000: (20, 50, 1000),
+}
+
+
+def escala_para(filas):
+    # La escala predefinida más cercana por arriba (o la mayor)
+    for tamano, escala in sorted(ESCALAS.items()):
+        if filas <= tamano:
+            return escala
+    return ESCALAS[max(ESCALAS)]
+
+
+def generar_libro(micro_redes, establecimientos, medicamentos, semilla=0):
+    # Un libro con las columnas requeridas y los doce meses: cada
+    # establecimiento pertenece a una micro red y lista todos los
+    # medicamentos. Las proporciones (meses en cero, tipos, precios, stock en
+    # meses de consumo) imitan las del libro de disponibilidad de la red.
+    rng = np.random.default_rng(semilla)
+    total_establecimientos = micro_redes * establecimientos
+    filas = total_establecimientos * medicamentos
+
+    establecimiento = np.repeat(np.arange(total_establecimientos), medicamentos)
+    micro_red = establecimiento // establecimientos
+    medicamento = np.tile(np.arange(medicamentos), total_establecimientos)
+
+    # Por medicamento: nivel de consumo, precio y clasificación; por
+    # establecimiento: su tamaño relativo
+    consumo_medicamento = rng.lognormal(3.5, 2.0, medicamentos)
+    precio_medicamento = np.round(rng.lognormal(1.5, 2.0, medicamentos), 2)
+    tipo_medicamento = rng.choice(['I', 'M'], medicamentos, p=[0.53, 0.47])
+    petitorio_medicamento = rng.choice(['_', 'P'], medicamentos, p=[0.59, 0.41])
+    estrategico_medicamento = rng.choice(['_', 'S', 'E'], medicamentos, p=[0.44, 0.40, 0.16])
+    tamano_establecimiento = rng.lognormal(0.0, 0.8, total_establecimientos)
+
+    media = consumo_medicamento[medicamento] * tamano_establecimiento[establecimiento]
+    salidas = rng.poisson(media[:, None] * rng.uniform(0.5, 1.5, (filas, len(MESES))))
+    # Alrededor de un 30 % de los meses sin salidas
+    salidas[rng.random((filas, len(MESES))) < 0.3] = 0
+
+    total = salidas.sum(axis=1)
+    cant_sin_ceros = (salidas > 0).sum(axis=1)
+    cpa = np.round(np.divide(total, cant_sin_ceros, out=np.zeros(filas), where=cant_sin_ceros > 0))
+
+    # Stock en meses de consumo: críticos, normales y sobrestock, y algunos sin stock
+    meses_stock = rng.choice([0.5, 2.5, 4.5, 12.0], filas, p=[0.25, 0.15, 0.35, 0.25]) * rng.uniform(0.5, 1.5, filas)
+    stock = np.round(np.where(cpa > 0, cpa * meses_stock, rng.integers(0, 50, filas)))
+    stock[rng.random(filas) < 0.1] = 0
+    disponibilidad = np.divide(stock, cpa, out=np.zeros(filas), where=cpa > 0)
+
+    columnas = {
+        'micro red': np.char.add('MICRO RED ', (micro_red + 1).astype(str)),
+        'codigo_est': np.char.add('E', np.char.zfill((establecimiento + 1).astype(str), 5)),
+        'establecimiento': np.char.add('ESTABLECIMIENTO ', (establecimiento + 1).astype(str)),
+        'codigo': 10000 + medicamento,
+        'medicamentos': np.char.add('MEDICAMENTO ', (medicamento + 1).astype(str)),
+        'precio': precio_medicamento[medicamento],
+        'siga': np.char.add('SIGA', np.char.zfill((medicamento + 1).astype(str), 6)),
+        'tipo': tipo_medicamento[medicamento],
+        'petitorio': petitorio_medicamento[medicamento],
+        'estrategico': estrategico_medicamento[medicamento],
+        'stock': stock.astype(np.int64),
+        'total': total,
+        'cant_sin_ceros': cant_sin_ceros,
+        'cpa': cpa.astype(np.int64),
+        'disponibilidad': disponibilidad,
+    }
+    columnas.update({mes: salidas[:, i] for i, mes in enumerate(MESES)})
+    return pd.DataFrame(columnas, columns=COLUMNAS_REQUERIDAS + MESES)
+
+
+def generar_filas(filas, semilla=0):
+    return generar_libro(*escala_para(filas), semilla=semilla)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.generador",
+        description="Genera un libro sintético con las columnas requeridas."
+    )
+    parser.add_argument("salida", help="Archivo de salida (.xlsx, .csv o .parquet).")
+    parser.add_argument("--filas", type=int, default=10_000,
+                        help=f"Filas aproximadas; escalas predefinidas: {', '.join(map(str, ESCALAS))}.")
+    parser.add_argument("--escala", help="micro redes,establecimientos por micro red,medicamentos "
+                                         "(reemplaza a --filas).")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    escala = escala_para(args.filas)
+    if args.escala:
+        try:
+            escala = tuple(int(valor) for valor in args.escala.split(","))
+        except ValueError:
+            escala = ()
+        if len(escala) != 3 or min(escala) < 1:
+            print("--escala debe ser tres enteros positivos separados por coma.", file=sys.stderr)
+            return 2
+
+    df = generar_libro(*escala, semilla=args.semilla)
+    if args.salida.endswith(".csv"):
+        df.to_csv(args.salida, index=False)
+    elif args.salida.endswith(".parquet"):
+        df.to_parquet(args.salida, index=False)
+    else:
+        df.to_excel(args.salida, index=False)
+    print(f"{args.salida}: {len(df)} filas ({escala[0]} micro redes × {escala[1]} establecimientos × "
+          f"{escala[2]} medicamentos)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import importlib
+
+# Los nombres públicos se importan recién al pedirlos (PEP 562): importar
+# un submódulo liviano, como hace la interfaz al arrancar, no carga
+# pandas ni el resto del paquete
+_MODULO_POR_NOMBRE = {
+    'MatrizDemanda': 'demanda',
+    **dict.fromkeys(['COLUMNAS_IDENTIFICADORES', 'ESQUEMA', 'aplicar_esquema', 'categorizar'], 'esquema'),
+    **dict.fromkeys(['cargar_estados', 'nombres_estados'], 'estados'),
+    **dict.fromkeys(['grupos_modificados', 'redistribuir_incremental'], 'incremental'),
+    **dict.fromkeys(['COLUMNAS_REQUERIDAS', 'MESES', 'exportar_excel', 'importar_excel'], 'excel'),
+    **dict.fromkeys(['MOTOR_CLASICO', 'MOTOR_INDICE', 'MOTOR_OPTIMO', 'MOTOR_OPTIMO_MICRO_RED',
+                     'MOTOR_PRIORIDAD', 'MOTOR_VECTORIZADO', 'solver_disponible'], 'motores'),
+    **dict.fromkeys(['COLUMNA_SIN_CAMBIO', 'COLUMNAS_STOCK', 'MARCA_SIN_CAMBIO', 'MOTORES',
+                     'DonantesPorPrioridad', 'IndiceDonantes', 'RedistribucionCancelada',
+                     'calcular_porcentaje_cpa', 'clasificar_estados', 'determinar_estado', 'redistribuir_stock',
+                     'resultado_para_presentacion'], 'motor'),
+    **dict.fromkeys(['redistribuir_optimo', 'traspasos_optimos'], 'optimo'),
+    **dict.fromkeys(['Medicion', 'etapa', 'medir', 'perfilador_configurado'], 'perfil'),
+    'redistribuir_por_bloques': 'por_bloques',
+    **dict.fromkeys(['archivos_del_lote', 'procesar_lote'], 'lote'),
+}
+
+__all__ = list(_MODULO_POR_NOMBRE)
+
+
+def __getattr__(nombre):
+    if nombre not in _MODULO_POR_NOMBRE:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f'.{_MODULO_POR_NOMBRE[nombre]}', __name__), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
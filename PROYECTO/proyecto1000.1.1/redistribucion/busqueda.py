@@ -0,0 +1,59 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+TAMANO_NGRAMA = 3
+
+
+def normalizar(texto):
+    # Mayúsculas y sin tildes: "Ñ" y "N", "Á" y "A" se buscan igual
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).upper()
+
+
+def _ngramas(texto):
+    return {texto[i:i + TAMANO_NGRAMA] for i in range(len(texto) - TAMANO_NGRAMA + 1)}
+
+
+class IndiceBusqueda:
+    # Índice de subcadenas sobre una columna de nombres. Los nombres se
+    # deduplican, así que el trabajo de texto es proporcional a los nombres
+    # distintos y no a las filas; cada trigrama apunta a los nombres que lo
+    # contienen, y el código de cada fila lleva de vuelta a las filas.
+
+    def __init__(self, columna):
+        self.codigos, nombres = pd.factorize(columna)
+        self.nombres = [normalizar(nombre) for nombre in nombres]
+
+        trigramas = {}
+        for id_nombre, nombre in enumerate(self.nombres):
+            for trigrama in _ngramas(nombre):
+                trigramas.setdefault(trigrama, []).append(id_nombre)
+        self.trigramas = {trigrama: np.array(ids) for trigrama, ids in trigramas.items()}
+
+    def buscar_nombres(self, consulta):
+        consulta = normalizar(consulta)
+        if len(consulta) < TAMANO_NGRAMA:
+            candidatos = range(len(self.nombres))
+        else:
+            # Intersección de las listas de cada trigrama, empezando por la más corta
+            listas = []
+            for trigrama in _ngramas(consulta):
+                ids = self.trigramas.get(trigrama)
+                if ids is None:
+                    return np.array([], dtype=np.int64)
+                listas.append(ids)
+            listas.sort(key=len)
+            candidatos = listas[0]
+            for ids in listas[1:]:
+                candidatos = np.intersect1d(candidatos, ids, assume_unique=True)
+        # Los trigramas no garantizan el orden: se confirma la subcadena
+        return np.array([i for i in candidatos if consulta in self.nombres[i]], dtype=np.int64)
+
+    def buscar(self, consulta):
+        # Máscara booleana de las filas cuyo nombre contiene la consulta; la
+        # última posición queda en False para las filas sin nombre (código -1)
+        seleccionados = np.zeros(len(self.nombres) + 1, dtype=bool)
+        seleccionados[self.buscar_nombres(consulta)] = True
+        return seleccionados[self.codigos]
@@ -0,0 +1,116 @@
+import hashlib
+import importlib.util
+import os
+
+import pandas as pd
+
+# Subir este número cuando cambie lo que entrega importar_excel (columnas,
+# tipos), para que no se sirvan entradas leídas con el lector anterior
+VERSION_LECTOR = 4
+
+TAMANO_MAXIMO = 512 * 1024 * 1024
+EXTENSION = '.parquet'
+
+
+def directorio_cache():
+    return os.environ.get('REDISTRIBUCION_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'redistribucion'))
+
+
+def cache_disponible():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def clave_archivo(archivo):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{VERSION_LECTOR}:".encode())
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def _ruta(clave):
+    return os.path.join(directorio_cache(), clave + EXTENSION)
+
+
+def leer_cache(clave):
+    ruta = _ruta(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        df = pd.read_parquet(ruta)
+    except Exception as e:
+        print(f"Entrada de caché ilegible, se descarta: {e}")
+        _eliminar(ruta)
+        return None
+    # La fecha de modificación marca el último uso para el desalojo LRU. Otro
+    # proceso del lote puede haberla desalojado recién: ya se leyó, da igual
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return df
+
+
+def guardar_cache(clave, df, tamano_maximo=TAMANO_MAXIMO):
+    # Una falla de la caché nunca hace fallar la importación
+    ruta = _ruta(clave)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directorio_cache(), exist_ok=True)
+        df.to_parquet(temporal, index=False, compression='zstd')
+        os.replace(temporal, ruta)
+    except Exception as e:
+        # Columnas con tipos mezclados, por ejemplo, no se pueden escribir
+        print(f"No se pudo guardar en caché: {e}")
+        _eliminar(temporal)
+        return False
+    try:
+        desalojar(tamano_maximo)
+    except OSError as e:
+        print(f"No se pudo desalojar la caché: {e}")
+    return True
+
+
+def _entradas():
+    directorio = directorio_cache()
+    if not os.path.isdir(directorio):
+        return []
+    entradas = []
+    for nombre in os.listdir(directorio):
+        if nombre.endswith(EXTENSION):
+            ruta = os.path.join(directorio, nombre)
+            # Con varios procesos compartiendo la caché, otro puede borrarla
+            # entre el listado y el stat
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, ruta))
+    return entradas
+
+
+def desalojar(tamano_maximo=TAMANO_MAXIMO):
+    # Borra las entradas usadas hace más tiempo hasta quedar bajo el límite
+    entradas = sorted(_entradas())
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in entradas:
+        if total <= tamano_maximo:
+            break
+        _eliminar(ruta)
+        total -= tamano
+
+
+def limpiar_cache():
+    entradas = _entradas()
+    for _, _, ruta in entradas:
+        _eliminar(ruta)
+    return len(entradas)
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
@@ -0,0 +1,191 @@
+import argparse
+import os
+import sys
+
+from .excel import COLUMNAS_REQUERIDAS, MESES, exportar_excel, importar_excel
+from .motor import MOTOR_VECTORIZADO, MOTORES, calcular_porcentaje_cpa, redistribuir_stock
+from .por_bloques import FILAS_POR_BLOQUE, redistribuir_por_bloques
+from .perfil import CPROFILE, PYINSTRUMENT, medir, perfilador_configurado
+
+SALIDA_OK = 0
+SALIDA_ERROR_IMPORTACION = 1
+SALIDA_ERROR_ARGUMENTOS = 2
+SALIDA_COLUMNAS_FALTANTES = 3
+SALIDA_SIN_MESES = 4
+SALIDA_ERROR_REDISTRIBUCION = 5
+SALIDA_ERROR_EXPORTACION = 6
+SALIDA_ERRORES_EN_LOTE = 7
+
+SUFIJO_SALIDA = "_redistribuido"
+
+
+def _sin_progreso(value):
+    pass
+
+
+def _archivo_salida(entrada, extension='.xlsx'):
+    base, _ = os.path.splitext(entrada)
+    return f"{base}{SUFIJO_SALIDA}{extension}"
+
+
+def ejecutar(entrada, salida, meses=None, motor=MOTOR_VECTORIZADO, workers=None, usar_cache=True, separador=',',
+             perfilador=None, filas_por_bloque=None, progress_callback=None):
+    # Importar, porcentaje cpa, redistribuir y exportar registran sus etapas
+    # en la medición de la corrida. Con `filas_por_bloque` el libro se
+    # redistribuye por bloques, sin cargarlo entero (motor vectorizado).
+    progress_callback = progress_callback or _sin_progreso
+    with medir('corrida', perfilador) as medicion:
+        medicion.datos.update({'entrada': entrada, 'salida': salida, 'motor': motor})
+        if filas_por_bloque:
+            medicion.datos['filas_por_bloque'] = filas_por_bloque
+            exito = redistribuir_por_bloques(entrada, salida, meses, progress_callback,
+                                             filas_por_bloque=filas_por_bloque, separador=separador)
+            codigo = SALIDA_OK if exito else SALIDA_ERROR_REDISTRIBUCION
+        else:
+            codigo = _ejecutar(entrada, salida, meses, motor, workers, usar_cache, separador, medicion,
+                               progress_callback)
+    medicion.datos['codigo'] = codigo
+    return codigo, medicion
+
+
+def _ejecutar(entrada, salida, meses, motor, workers, usar_cache, separador, medicion, progress_callback):
+    # El avance de la corrida: importar llega al 20 %, redistribuir al 80 % y exportar al 100 %
+    df = importar_excel(entrada, usar_cache=usar_cache)
+    if df is None:
+        return SALIDA_ERROR_IMPORTACION
+    medicion.datos['filas'] = len(df)
+
+    df.columns = df.columns.str.lower()
+    missing_columns = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
+    if missing_columns:
+        print(f"Faltan las columnas: {', '.join(missing_columns)}", file=sys.stderr)
+        return SALIDA_COLUMNAS_FALTANTES
+
+    existing_months = [mes for mes in (meses or MESES) if mes in df.columns]
+    if not existing_months:
+        print("No hay meses válidos para redistribuir el stock.", file=sys.stderr)
+        return SALIDA_SIN_MESES
+
+    df = calcular_porcentaje_cpa(df)
+    progress_callback(20)
+
+    df_redistribuido = redistribuir_stock(df, existing_months, lambda value: progress_callback(20 + value * 60 // 100),
+                                          motor=motor, workers=workers)
+    if df_redistribuido is None:
+        return SALIDA_ERROR_REDISTRIBUCION
+
+    exportado = exportar_excel(df_redistribuido, salida, lambda value: progress_callback(80 + value * 20 // 100),
+                               separador=separador)
+    if not exportado:
+        return SALIDA_ERROR_EXPORTACION
+
+    return SALIDA_OK
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m redistribucion",
+        description="Redistribución de stock sin interfaz gráfica."
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    run = subparsers.add_parser("run", help="Importa, redistribuye y exporta un libro Excel.")
+    run.add_argument("entrada", help="Libro Excel de entrada.")
+    run.add_argument("-o", "--output",
+                     help="Archivo de salida; el formato sale de la extensión: .xlsx, .csv, .parquet o .arrow "
+                          "(por defecto <entrada>_redistribuido.xlsx).")
+    run.add_argument("--meses", help="Meses separados por coma (por defecto todos los presentes).")
+    run.add_argument("--motor", choices=sorted(MOTORES), default=MOTOR_VECTORIZADO,
+                     help="Motor de redistribución.")
+    run.add_argument("--workers", type=int, default=None,
+                     help="Procesos para el modo paralelo (1 o sin indicar: secuencial).")
+    run.add_argument("--separador", default=",", help="Separador de columnas para la salida CSV.")
+    run.add_argument("--sin-cache", action="store_true",
+                     help="No leer ni escribir la caché de libros importados.")
+    run.add_argument("--por-bloques", action="store_true",
+                     help="Lee, redistribuye y escribe el libro por bloques, sin cargarlo entero; usa el motor "
+                          "vectorizado y escribe .xlsx o .csv.")
+    run.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE,
+                     help="Filas de cada bloque con --por-bloques.")
+    run.add_argument("--informe",
+                     help="Guarda los tiempos por etapa en este JSON y la tabla en un .txt al lado.")
+    run.add_argument("--perfil", choices=[CPROFILE, PYINSTRUMENT], default=perfilador_configurado(),
+                     help="Captura además un perfil completo de la corrida (por defecto según "
+                          "REDISTRIBUCION_PERFIL); con cProfile se guarda un .prof junto al informe.")
+
+    lote = subparsers.add_parser("lote", help="Procesa en paralelo todos los libros de una carpeta o patrón.")
+    lote.add_argument("origen", help="Carpeta con los libros, o un patrón como 'mayo/*.xlsx'.")
+    lote.add_argument("--formato", choices=["xlsx", "csv", "parquet", "arrow"], default="xlsx",
+                      help="Formato de los resultados, que quedan al lado de cada libro como "
+                           "<libro>_redistribuido.<formato>.")
+    lote.add_argument("--meses", help="Meses separados por coma (por defecto todos los presentes).")
+    lote.add_argument("--motor", choices=sorted(MOTORES), default=MOTOR_VECTORIZADO,
+                      help="Motor de redistribución.")
+    lote.add_argument("--workers", type=int, default=None,
+                      help="Libros procesados a la vez (por defecto uno por núcleo).")
+    lote.add_argument("--separador", default=",", help="Separador de columnas para la salida CSV.")
+    lote.add_argument("--sin-cache", action="store_true",
+                      help="No leer ni escribir la caché de libros importados.")
+    return parser
+
+
+def _main_lote(args, meses):
+    from .lote import archivos_del_lote, procesar_lote
+
+    archivos = archivos_del_lote(args.origen)
+    if not archivos:
+        print(f"No se encontraron libros en '{args.origen}'.", file=sys.stderr)
+        return SALIDA_ERROR_ARGUMENTOS
+
+    def informar(posicion, resultado):
+        if resultado['codigo'] == SALIDA_OK:
+            print(f"{resultado['entrada']}: OK ({resultado['segundos']:.1f} s) -> {resultado['salida']}")
+        else:
+            detalle = resultado['mensajes'][-1] if resultado['mensajes'] else ""
+            print(f"{resultado['entrada']}: error (código {resultado['codigo']}) {detalle}")
+
+    print(f"Procesando {len(archivos)} libros...")
+    resultados = procesar_lote(archivos, meses, args.motor, args.workers, not args.sin_cache, args.separador,
+                               f".{args.formato}", archivo_callback=informar)
+    correctos = sum(resultado['codigo'] == SALIDA_OK for resultado in resultados)
+    print(f"{correctos} de {len(resultados)} libros procesados correctamente.")
+    return SALIDA_OK if correctos == len(resultados) else SALIDA_ERRORES_EN_LOTE
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+
+    meses = None
+    if args.meses:
+        meses = [mes.strip().lower() for mes in args.meses.split(",") if mes.strip()]
+        desconocidos = [mes for mes in meses if mes not in MESES]
+        if desconocidos:
+            print(f"Meses no reconocidos: {', '.join(desconocidos)}", file=sys.stderr)
+            return SALIDA_ERROR_ARGUMENTOS
+    if args.workers is not None and args.workers < 1:
+        print("--workers debe ser al menos 1.", file=sys.stderr)
+        return SALIDA_ERROR_ARGUMENTOS
+    if args.comando == "lote":
+        return _main_lote(args, meses)
+    if args.por_bloques:
+        if args.filas_por_bloque < 1:
+            print("--filas-por-bloque debe ser al menos 1.", file=sys.stderr)
+            return SALIDA_ERROR_ARGUMENTOS
+        if args.motor != MOTOR_VECTORIZADO or args.workers not in (None, 1):
+            print("--por-bloques usa solo el motor vectorizado, sin --workers.", file=sys.stderr)
+            return SALIDA_ERROR_ARGUMENTOS
+
+    salida = args.output or _archivo_salida(args.entrada)
+    codigo, medicion = ejecutar(args.entrada, salida, meses, args.motor, args.workers, not args.sin_cache,
+                                args.separador, args.perfil,
+                                args.filas_por_bloque if args.por_bloques else None)
+
+    print(f"{args.entrada}: {'OK' if codigo == SALIDA_OK else f'error (código {codigo})'}")
+    print(medicion.tabla())
+    if medicion.perfil and not args.informe:
+        print(medicion.perfil)
+    if args.informe:
+        if medicion.guardar(args.informe):
+            print(f"Informe de tiempos guardado en {args.informe}")
+    return codigo
@@ -0,0 +1,68 @@
+import numpy as np
+
+# Hasta aquí float32 representa exactamente todos los enteros
+LIMITE_EXACTO_FLOAT32 = 2 ** 24
+
+
+def _exacta_en_float32(serie):
+    if serie.dtype == np.float32:
+        return True
+    return serie.dtype == np.int32 and np.abs(serie.to_numpy(dtype=np.int64)).max(initial=0) <= LIMITE_EXACTO_FLOAT32
+
+
+class MatrizDemanda:
+    # Salidas de los meses como una matriz contigua filas × meses, con sus
+    # sumas acumuladas. El total de cualquier ventana de meses seguidos es
+    # una resta de dos columnas, así que probar otra ventana no vuelve a
+    # recorrer el DataFrame. Los vacíos se cuentan aparte para que un mes
+    # vacío fuera de la ventana no contamine la resta.
+
+    def __init__(self, df, meses):
+        self.meses = [mes for mes in meses if mes in df.columns]
+        self.posicion = {mes: i for i, mes in enumerate(self.meses)}
+
+        # float32 alcanza para las salidas que deja el esquema (int32/float32):
+        # las float32 no cambian y los enteros son exactos hasta 2**24. Con
+        # enteros más grandes o con otros tipos se usa float64
+        compacto = all(_exacta_en_float32(df[mes]) for mes in self.meses)
+        self.matriz = np.empty((len(df), len(self.meses)), dtype=np.float32 if compacto else np.float64)
+        for i, mes in enumerate(self.meses):
+            self.matriz[:, i] = df[mes].to_numpy(dtype=float)
+
+        vacios = np.isnan(self.matriz)
+        self.acumulada = np.cumsum(np.where(vacios, 0.0, self.matriz), axis=1, dtype=np.float64)
+        self.vacios_acumulados = np.cumsum(vacios, axis=1, dtype=np.int16)
+
+    def _ventanas(self, meses):
+        # Tramos de meses seguidos (inicio, fin) que cubren la selección
+        indices = sorted({self.posicion[mes] for mes in meses if mes in self.posicion})
+        tramos = []
+        for indice in indices:
+            if tramos and tramos[-1][1] == indice - 1:
+                tramos[-1][1] = indice
+            else:
+                tramos.append([indice, indice])
+        return tramos
+
+    def total(self, meses=None):
+        # Suma de salidas por fila en los meses pedidos y si alguno estaba vacío
+        total = np.zeros(len(self.matriz))
+        con_vacios = np.zeros(len(self.matriz), dtype=bool)
+        for inicio, fin in self._ventanas(self.meses if meses is None else meses):
+            total += self.acumulada[:, fin]
+            vacios = self.vacios_acumulados[:, fin].copy()
+            if inicio > 0:
+                total -= self.acumulada[:, inicio - 1]
+                vacios -= self.vacios_acumulados[:, inicio - 1]
+            con_vacios |= vacios > 0
+        return total, con_vacios
+
+    def abastecimiento(self, stock, meses=None):
+        # Salidas acumuladas topadas en el stock. aplicar_esquema deja las
+        # salidas en 0 o más, y así topar mes a mes da lo mismo que topar el
+        # total; un mes vacío deja la fila sin demanda, como en el bucle clásico
+        meses = self.meses if meses is None else [mes for mes in meses if mes in self.posicion]
+        total, con_vacios = self.total(meses)
+        abastecimiento = np.minimum(total, stock)
+        abastecimiento[con_vacios] = np.nan
+        return np.where(stock > 0, abastecimiento, 0.0)
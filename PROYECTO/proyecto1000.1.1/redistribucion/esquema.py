@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+COLUMNAS_REQUERIDAS = ['micro red', 'codigo_est', 'establecimiento', 'codigo',
+                       'medicamentos', 'precio', 'siga', 'tipo',
+                       'petitorio', 'estrategico', 'stock',
+                       'total', 'cant_sin_ceros', 'cpa', 'disponibilidad']
+
+MESES = ['setiembre', 'octubre', 'noviembre', 'diciembre',
+         'enero', 'febrero', 'marzo', 'abril',
+         'mayo', 'junio', 'julio', 'agosto']
+
+NUMERO = 'numero'
+CATEGORIA = 'categoria'
+
+# Tipo de cada columna conocida. Las que no figuran (codigo_est, siga,
+# petitorio, estrategico y las adicionales) se dejan como vienen.
+ESQUEMA = {
+    'micro red': CATEGORIA,
+    'establecimiento': CATEGORIA,
+    'codigo': CATEGORIA,
+    'medicamentos': CATEGORIA,
+    'tipo': CATEGORIA,
+    'precio': NUMERO,
+    'stock': NUMERO,
+    'total': NUMERO,
+    'cant_sin_ceros': NUMERO,
+    'cpa': NUMERO,
+    'disponibilidad': NUMERO,
+    **{mes: NUMERO for mes in MESES},
+}
+
+# Identificadores que se repiten en muchas filas: se guardan como categorías
+# (un código entero por fila) y se decodifican solo al mostrar o exportar
+COLUMNAS_IDENTIFICADORES = [columna for columna, tipo in ESQUEMA.items() if tipo == CATEGORIA]
+
+# float32 representa exactamente los enteros hasta 2**24
+MAXIMO_ENTERO_FLOAT32 = 2 ** 24
+EJEMPLOS_POR_COLUMNA = 3
+
+
+def _categorica(serie):
+    # Las categorías quedan en orden de aparición, que es el orden en que el
+    # bucle clásico recorre las micro redes
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    codigos, categorias = pd.factorize(serie)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index)
+
+
+def categorizar(df, columnas=COLUMNAS_IDENTIFICADORES):
+    columnas = {columna.lower() for columna in columnas}
+    for columna in df.columns:
+        if str(columna).lower() in columnas:
+            df[columna] = _categorica(df[columna])
+    return df
+
+
+def tipo_compacto(valores):
+    # int32 si todos son enteros, no hay vacíos y caben; float32 si son
+    # enteros con vacíos; con decimales se queda en float64 para no redondear
+    presentes = valores[~np.isnan(valores)]
+    if not np.isfinite(presentes).all() or not np.array_equal(presentes, np.round(presentes)):
+        return np.float64
+    maximo = np.abs(presentes).max() if len(presentes) else 0
+    if len(presentes) == len(valores) and maximo <= np.iinfo(np.int32).max:
+        return np.int32
+    if maximo <= MAXIMO_ENTERO_FLOAT32:
+        return np.float32
+    return np.float64
+
+
+def _convertir_numero(serie):
+    # Devuelve la serie compacta y los textos que no se pudieron leer como número
+    if serie.dtype in (np.int32, np.float32):
+        return serie, []
+    if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+        numeros = serie
+        fallidos = []
+    else:
+        numeros = pd.to_numeric(serie, errors='coerce')
+        vacios = serie.isna() | serie.astype(str).str.strip().eq('')
+        fallidos = serie[numeros.isna() & ~vacios].tolist()
+    valores = numeros.to_numpy(dtype=float, na_value=np.nan)
+    return pd.Series(valores.astype(tipo_compacto(valores)), index=serie.index), fallidos
+
+
+def _sin_salidas_negativas(serie):
+    # Una salida negativa (devolución o ajuste) no es consumo y se toma como
+    # 0. El bucle clásico la sumaba mes a mes y llegaba a "recibir"
+    # cantidades negativas de cada donante, algo que los motores que
+    # trabajan con la demanda total no reproducen.
+    negativas = int((serie < 0).sum())
+    if negativas:
+        serie = serie.clip(lower=0)
+    return serie, negativas
+
+
+def aplicar_esquema(df, columnas=None):
+    # Convierte de una vez las columnas conocidas a su tipo; los valores que
+    # no son números quedan vacíos y se informan por columna en
+    # df.attrs['errores_conversion'] como {columna: [cantidad, ejemplos]}.
+    # Las salidas negativas de los meses quedan en 0 y se informan en
+    # df.attrs['salidas_negativas'] como {mes: cantidad}.
+    errores = {}
+    negativas = {}
+    for columna in df.columns:
+        nombre = str(columna).lower()
+        if columnas is not None and nombre not in columnas:
+            continue
+        tipo = ESQUEMA.get(nombre)
+        if tipo == NUMERO:
+            df[columna], fallidos = _convertir_numero(df[columna])
+            if fallidos:
+                errores[nombre] = [len(fallidos), [str(valor) for valor in fallidos[:EJEMPLOS_POR_COLUMNA]]]
+            if nombre in MESES:
+                df[columna], cantidad = _sin_salidas_negativas(df[columna])
+                if cantidad:
+                    negativas[nombre] = cantidad
+        elif tipo == CATEGORIA:
+            df[columna] = _categorica(df[columna])
+
+    if errores:
+        df.attrs['errores_conversion'] = {**df.attrs.get('errores_conversion', {}), **errores}
+        for nombre, (cantidad, ejemplos) in errores.items():
+            print(f"Columna '{nombre}': {cantidad} valores no numéricos quedaron vacíos (p. ej. {', '.join(ejemplos)}).")
+    if negativas:
+        df.attrs['salidas_negativas'] = {**df.attrs.get('salidas_negativas', {}), **negativas}
+        for nombre, cantidad in negativas.items():
+            print(f"Columna '{nombre}': {cantidad} salidas negativas se tomaron como 0.")
+    return df
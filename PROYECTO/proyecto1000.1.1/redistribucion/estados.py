@@ -0,0 +1,88 @@
+import functools
+import json
+import os
+
+# NumPy y pandas se importan en las funciones que los usan: la interfaz
+# llena el filtro de estados al arrancar, antes de cargarlos
+
+ARCHIVO_ESTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'estados.json')
+
+# Meses de disponibilidad: hasta dónde llega cada estado. El último no tiene
+# límite y recibe todo lo demás, incluidas las filas sin disponibilidad.
+ESTADOS_POR_DEFECTO = [
+    ("CRITICO", 2.0, False),
+    ("SUB STOCK", 3.0, False),
+    ("NORMO STOCK", 6.0, True),
+    ("SOBRE STOCK", None, False),
+]
+
+
+def archivo_estados():
+    return os.environ.get('REDISTRIBUCION_ESTADOS', ARCHIVO_ESTADOS)
+
+
+def _validar(configuracion):
+    estados = []
+    for estado in configuracion['estados']:
+        hasta = estado.get('hasta')
+        estados.append((str(estado['nombre']), None if hasta is None else float(hasta),
+                        bool(estado.get('incluye_limite', False))))
+    nombres = [nombre for nombre, _, _ in estados]
+    limites = [hasta for _, hasta, _ in estados[:-1]]
+    if len(estados) < 2 or len(set(nombres)) != len(nombres):
+        raise ValueError("se necesitan al menos dos estados con nombres distintos")
+    if None in limites or estados[-1][1] is not None:
+        raise ValueError("todos los estados menos el último deben tener 'hasta'")
+    if limites != sorted(limites):
+        raise ValueError("los límites deben ir de menor a mayor")
+    return estados
+
+
+def cargar_estados(archivo=None):
+    archivo = archivo or archivo_estados()
+    try:
+        with open(archivo, encoding='utf-8') as f:
+            return _validar(json.load(f))
+    except FileNotFoundError:
+        return ESTADOS_POR_DEFECTO
+    except Exception as e:
+        print(f"Configuración de estados inválida en '{archivo}' ({e}); se usan los umbrales por defecto.")
+        return ESTADOS_POR_DEFECTO
+
+
+@functools.lru_cache(maxsize=None)
+def estados_configurados():
+    # Se lee una vez por proceso; los procesos del modo paralelo leen el mismo archivo
+    return cargar_estados()
+
+
+def nombres_estados(estados=None):
+    return [nombre for nombre, _, _ in estados or estados_configurados()]
+
+
+def determinar_estado(disponibilidad, estados=None):
+    estados = estados or estados_configurados()
+    for nombre, hasta, incluye_limite in estados[:-1]:
+        if disponibilidad < hasta or (incluye_limite and disponibilidad == hasta):
+            return nombre
+    return estados[-1][0]
+
+
+def tipo_estado(estados=None):
+    import pandas as pd
+
+    return pd.CategoricalDtype(nombres_estados(estados), ordered=True)
+
+
+def clasificar_estados(disponibilidad, estados=None):
+    # Misma regla que determinar_estado, aplicada a toda la columna: el
+    # primer estado cuyo límite se cumple, en una sola pasada
+    import numpy as np
+    import pandas as pd
+
+    estados = estados or estados_configurados()
+    disponibilidad = np.asarray(disponibilidad, dtype=float)
+    condiciones = [disponibilidad <= hasta if incluye_limite else disponibilidad < hasta
+                   for _, hasta, incluye_limite in estados[:-1]]
+    codigos = np.select(condiciones, np.arange(len(condiciones)), default=len(condiciones))
+    return pd.Categorical.from_codes(codigos, dtype=tipo_estado(estados))
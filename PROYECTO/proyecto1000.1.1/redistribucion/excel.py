@@ -0,0 +1,165 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from . import cache, formatos
+from .esquema import COLUMNAS_REQUERIDAS, MESES, aplicar_esquema
+from .motor import resultado_para_presentacion
+from .perfil import etapa, medido
+
+# Columnas que siempre son texto; se leen como tal para que el lector no
+# tenga que inferir el tipo celda por celda
+COLUMNAS_TEXTO = ['micro red', 'establecimiento', 'medicamentos', 'tipo']
+
+
+def motor_lectura():
+    # calamine (Rust) es bastante más rápido que openpyxl; si no está
+    # instalado pandas elige su lector por defecto
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return None
+
+
+def leer_encabezado(archivo, engine=None):
+    # openpyxl en modo solo lectura entrega la primera fila sin cargar la
+    # hoja; calamine, en cambio, carga la hoja entera aunque se pida nrows=0
+    if str(archivo).lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+            libro = load_workbook(archivo, read_only=True)
+            try:
+                encabezado = next(libro.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+            finally:
+                libro.close()
+            return [col for col in encabezado if col is not None]
+        except ImportError:
+            pass
+    return list(pd.read_excel(archivo, engine=engine, nrows=0).columns)
+
+
+def _leer_proyectado(archivo, engine):
+    # Solo se leen las columnas requeridas y los meses, sin importar las
+    # mayúsculas del encabezado; el resto se registra en attrs
+    encabezado = leer_encabezado(archivo, engine)
+    deseadas = set(COLUMNAS_REQUERIDAS) | set(MESES)
+    usecols = [col for col in encabezado if str(col).lower() in deseadas]
+    dtype = {col: str for col in usecols if str(col).lower() in COLUMNAS_TEXTO}
+
+    df = pd.read_excel(archivo, engine=engine, usecols=usecols, dtype=dtype)
+    df.attrs['columnas_descartadas'] = [str(col) for col in encabezado if str(col).lower() not in deseadas]
+    return df
+
+
+@medido('importar')
+def importar_excel(archivo, usar_cache=True):
+    try:
+        usar_cache = usar_cache and cache.cache_disponible()
+        if usar_cache:
+            with etapa('leer caché'):
+                clave = cache.clave_archivo(archivo)
+                df = cache.leer_cache(clave)
+            if df is not None:
+                # Parquet no conserva todas las categorías (p. ej. códigos numéricos)
+                with etapa('aplicar esquema'):
+                    return aplicar_esquema(df)
+
+        engine = motor_lectura()
+        with etapa('leer libro'):
+            try:
+                df = _leer_proyectado(archivo, engine)
+            except Exception as e:
+                if engine is None:
+                    raise
+                print(f"No se pudo leer con {engine} ({e}); se usa el lector por defecto.")
+                df = _leer_proyectado(archivo, None)
+        with etapa('aplicar esquema'):
+            aplicar_esquema(df)
+
+        if usar_cache:
+            with etapa('guardar caché'):
+                cache.guardar_cache(clave, df)
+        return df
+    except Exception as e:
+        print(f"Error al importar el archivo: {e}")
+        return None
+
+
+# Filas por bloque al exportar: cada bloque se convierte a valores de Python
+# y se escribe de una vez, sin armar el libro completo en memoria
+FILAS_POR_BLOQUE = 5000
+
+
+def _valor_celda(valor):
+    # NaN no es un número válido en XLSX; se deja la celda vacía
+    if isinstance(valor, float) and valor != valor:
+        return None
+    return valor
+
+
+def _bloques_de_filas(df, filas):
+    columnas = [df[columna].to_numpy() for columna in df.columns]
+    for inicio in range(0, len(filas), FILAS_POR_BLOQUE):
+        bloque = filas[inicio:inicio + FILAS_POR_BLOQUE]
+        valores = [[_valor_celda(v) for v in columna[bloque].tolist()] for columna in columnas]
+        yield inicio + len(bloque), zip(*valores)
+
+
+def _escribir_xlsxwriter(df, archivo, filas, progress_callback):
+    import xlsxwriter
+
+    libro = xlsxwriter.Workbook(archivo, {'constant_memory': True})
+    try:
+        hoja = libro.add_worksheet()
+        hoja.write_row(0, 0, [str(columna) for columna in df.columns])
+        numero_fila = 1
+        for escritas, bloque in _bloques_de_filas(df, filas):
+            for fila in bloque:
+                hoja.write_row(numero_fila, 0, fila)
+                numero_fila += 1
+            progress_callback(int(escritas / max(len(filas), 1) * 100))
+    finally:
+        libro.close()
+
+
+def _escribir_openpyxl(df, archivo, filas, progress_callback):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append([str(columna) for columna in df.columns])
+    for escritas, bloque in _bloques_de_filas(df, filas):
+        for fila in bloque:
+            hoja.append(fila)
+        progress_callback(int(escritas / max(len(filas), 1) * 100))
+    libro.save(archivo)
+
+
+def _sin_progreso(value):
+    pass
+
+
+@medido('exportar')
+def exportar_excel(df, archivo, progress_callback=None, filas=None, separador=','):
+    # `filas` son posiciones a exportar (por ejemplo, las visibles tras un
+    # filtro); por defecto se exporta todo el DataFrame. El formato sale de
+    # la extensión: .csv, .parquet, .arrow/.feather/.ipc o, si no, XLSX.
+    try:
+        progress_callback = progress_callback or _sin_progreso
+        filas = np.arange(len(df)) if filas is None else np.asarray(filas)
+        formato = formatos.formato_de_archivo(archivo)
+        if formato in (formatos.FORMATO_PARQUET, formatos.FORMATO_ARROW):
+            # Los formatos columnares guardan los tipos tal cual, sin "SC"
+            formatos.ESCRITORES[formato](df, archivo, filas, progress_callback)
+        elif formato == formatos.FORMATO_CSV:
+            formatos.escribir_csv(resultado_para_presentacion(df), archivo, filas, progress_callback, separador)
+        elif importlib.util.find_spec('xlsxwriter') is not None:
+            _escribir_xlsxwriter(resultado_para_presentacion(df), archivo, filas, progress_callback)
+        else:
+            _escribir_openpyxl(resultado_para_presentacion(df), archivo, filas, progress_callback)
+        progress_callback(100)
+        print(f"Archivo exportado correctamente a: {archivo}")
+        return True
+    except Exception as e:
+        print(f"Error al exportar el archivo: {e}")
+        return False
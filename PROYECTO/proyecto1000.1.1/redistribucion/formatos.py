@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+
+from .esquema import COLUMNAS_IDENTIFICADORES
+from .motor import COLUMNAS_SALIDA_CATEGORICAS
+
+FORMATO_XLSX = 'xlsx'
+FORMATO_CSV = 'csv'
+FORMATO_PARQUET = 'parquet'
+FORMATO_ARROW = 'arrow'
+
+EXTENSIONES = {
+    '.xlsx': FORMATO_XLSX,
+    '.csv': FORMATO_CSV,
+    '.parquet': FORMATO_PARQUET,
+    '.arrow': FORMATO_ARROW,
+    '.feather': FORMATO_ARROW,
+    '.ipc': FORMATO_ARROW,
+}
+
+FILAS_POR_BLOQUE_CSV = 50000
+# Cada grupo de filas de Parquet/Arrow guarda sus propias estadísticas
+# (mínimo, máximo, nulos), que los lectores usan para saltar grupos
+FILAS_POR_GRUPO = 100000
+# Códigos que pueden traer ceros a la izquierda ("000123"): quedan como texto
+# aunque solo tengan dígitos, con el nombre de la planilla o el del resultado
+COLUMNAS_SIN_CONVERTIR = {columna.lower() for columna in
+                          COLUMNAS_IDENTIFICADORES + COLUMNAS_SALIDA_CATEGORICAS + ['codigo_est']}
+
+
+def formato_de_archivo(archivo):
+    _, extension = os.path.splitext(str(archivo).lower())
+    return EXTENSIONES.get(extension, FORMATO_XLSX)
+
+
+def columnas_tipadas(df):
+    # Las columnas de texto que solo traen números (y vacíos) se guardan
+    # como números con nulos, para que leerlas no requiera parseo
+    df = df.copy()
+    for columna in df.columns:
+        if df[columna].dtype != object or str(columna).lower() in COLUMNAS_SIN_CONVERTIR:
+            continue
+        valores = df[columna]
+        numeros = pd.to_numeric(valores, errors='coerce')
+        es_texto = valores.map(lambda v: isinstance(v, str)).to_numpy()
+        marcas = set(valores[es_texto & numeros.isna().to_numpy()].unique())
+        if numeros.notna().any() and marcas <= {""}:
+            df[columna] = numeros.astype('Float64')
+    return df
+
+
+def _bloques(filas, tamano):
+    for inicio in range(0, len(filas), tamano):
+        yield inicio + min(tamano, len(filas) - inicio), filas[inicio:inicio + tamano]
+
+
+def escribir_csv(df, archivo, filas, progress_callback, separador=','):
+    with open(archivo, 'w', encoding='utf-8', newline='') as f:
+        df.iloc[:0].to_csv(f, sep=separador, index=False)
+        for escritas, bloque in _bloques(filas, FILAS_POR_BLOQUE_CSV):
+            df.iloc[bloque].to_csv(f, sep=separador, index=False, header=False)
+            progress_callback(int(escritas / max(len(filas), 1) * 100))
+
+
+def _tabla_arrow(df, esquema):
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+
+def escribir_parquet(df, archivo, filas, progress_callback):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = columnas_tipadas(df)
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(archivo, esquema, compression='zstd', write_statistics=True) as escritor:
+        for escritas, bloque in _bloques(filas, FILAS_POR_GRUPO):
+            escritor.write_table(_tabla_arrow(df.iloc[bloque], esquema))
+            progress_callback(int(escritas / max(len(filas), 1) * 100))
+
+
+def escribir_arrow(df, archivo, filas, progress_callback):
+    import pyarrow as pa
+
+    df = columnas_tipadas(df)
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    opciones = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.OSFile(archivo, 'wb') as destino, pa.ipc.new_file(destino, esquema, options=opciones) as escritor:
+        for escritas, bloque in _bloques(filas, FILAS_POR_GRUPO):
+            escritor.write_table(_tabla_arrow(df.iloc[bloque], esquema))
+            progress_callback(int(escritas / max(len(filas), 1) * 100))
+
+
+ESCRITORES = {
+    FORMATO_CSV: escribir_csv,
+    FORMATO_PARQUET: escribir_parquet,
+    FORMATO_ARROW: escribir_arrow,
+}
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from .esquema import categorizar
+from .motor import (COLUMNAS_SALIDA_CATEGORICAS, MOTOR_INDICE, MOTOR_PRIORIDAD, MOTOR_VECTORIZADO, MOTORES,
+                    RedistribucionCancelada, _preparar_columnas, redistribuir_stock)
+from .perfil import etapa, medido
+
+COLUMNAS_CLAVE = ['establecimiento', 'codigo']
+COLUMNAS_GRUPO = ['codigo', 'tipo']
+
+
+def _codigos(serie, categorias):
+    # Códigos de la columna en las categorías del DataFrame anterior: -1 para
+    # vacíos y -2 para valores que el anterior no tenía
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    traduccion = categorias.get_indexer(serie.cat.categories)
+    traduccion = np.append(np.where(traduccion < 0, -2, traduccion), -1)
+    return traduccion[serie.cat.codes.to_numpy()]
+
+
+def _combinar(codigos, cantidades):
+    # Un solo entero por combinación de códigos (todos >= -2)
+    clave = np.zeros(len(codigos[0]), dtype=np.int64)
+    for codigo, cantidad in zip(codigos, cantidades):
+        clave = clave * (cantidad + 2) + (codigo + 2)
+    return clave
+
+
+class _Codificacion:
+    # Columnas categóricas de ambos DataFrames llevadas a los códigos del
+    # anterior, para comparar enteros en lugar de decodificar textos
+
+    def __init__(self, df_anterior):
+        self.categorias = {
+            columna: pd.Index(df_anterior[columna].cat.categories)
+            for columna in df_anterior.columns
+            if isinstance(df_anterior[columna].dtype, pd.CategoricalDtype)
+        }
+
+    def codigos(self, df, columna):
+        return _codigos(df[columna], self.categorias[columna])
+
+    def clave(self, df, columnas):
+        return _combinar([self.codigos(df, columna) for columna in columnas],
+                         [len(self.categorias[columna]) for columna in columnas])
+
+
+def _claves(codificacion, df):
+    # (establecimiento, codigo) y su número de aparición, por si un
+    # establecimiento repite el código en varias filas
+    clave = codificacion.clave(df, COLUMNAS_CLAVE)
+    ocurrencia = pd.Series(clave).groupby(clave, sort=False).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([clave, ocurrencia])
+
+
+def _filas_distintas(codificacion, df_anterior, df_nuevo, posiciones, columnas):
+    # Compara fila a fila las que tienen pareja; dos vacíos cuentan como iguales
+    distintas = np.zeros(len(posiciones), dtype=bool)
+    for columna in columnas:
+        if columna in codificacion.categorias:
+            nuevo = codificacion.codigos(df_nuevo, columna)
+            anterior = df_anterior[columna].cat.codes.to_numpy()[posiciones]
+            distintas |= nuevo != anterior
+            continue
+        nuevo = df_nuevo[columna].to_numpy()
+        anterior = df_anterior[columna].to_numpy()[posiciones]
+        iguales = (nuevo == anterior) | (pd.isna(nuevo) & pd.isna(anterior))
+        distintas |= ~np.asarray(iguales, dtype=bool)
+    return distintas
+
+
+def grupos_modificados(df_anterior, df_nuevo):
+    # Devuelve, para cada fila del nuevo, la posición de su pareja en el
+    # anterior (-1 si es nueva) y un booleano por fila del nuevo que marca
+    # las de los (codigo, tipo) a recalcular: los de filas nuevas,
+    # modificadas o eliminadas, con su grupo anterior y el actual. None si
+    # las columnas cambiaron y no se puede comparar.
+    columnas = [columna for columna in df_nuevo.columns if columna != 'original_index']
+    if set(columnas) != {columna for columna in df_anterior.columns if columna != 'original_index'}:
+        return None, None
+
+    codificacion = _Codificacion(df_anterior)
+    posiciones = _claves(codificacion, df_anterior).get_indexer(_claves(codificacion, df_nuevo))
+    con_pareja = posiciones >= 0
+
+    distintas = np.ones(len(df_nuevo), dtype=bool)
+    distintas[con_pareja] = _filas_distintas(
+        codificacion, df_anterior, df_nuevo.iloc[np.flatnonzero(con_pareja)], posiciones[con_pareja], columnas
+    )
+    eliminadas = np.ones(len(df_anterior), dtype=bool)
+    eliminadas[posiciones[con_pareja]] = False
+    eliminadas[posiciones[con_pareja & distintas]] = True
+
+    grupo_nuevo = codificacion.clave(df_nuevo, COLUMNAS_GRUPO)
+    grupo_anterior = codificacion.clave(df_anterior, COLUMNAS_GRUPO)
+    grupos = np.union1d(grupo_nuevo[distintas], grupo_anterior[eliminadas])
+    return posiciones, np.isin(grupo_nuevo, grupos)
+
+
+def _orden_micro_redes(df):
+    return list(df['micro red'].dropna().unique())
+
+
+@medido('redistribuir incremental')
+def redistribuir_incremental(df_anterior, resultado_anterior, df_nuevo, meses, progress_callback,
+                             motor=MOTOR_VECTORIZADO):
+    # Cada (codigo, tipo) se redistribuye sin mirar a los demás grupos, así
+    # que tras corregir algunas filas basta con recalcular los grupos
+    # tocados y copiar el resto del resultado anterior. Si la comparación no
+    # es segura (cambiaron las columnas o el orden de las filas) se
+    # recalcula todo.
+    try:
+        _preparar_columnas(df_anterior)
+        _preparar_columnas(df_nuevo)
+        with etapa('comparar'):
+            posiciones, tocadas = grupos_modificados(df_anterior, df_nuevo)
+        if posiciones is None:
+            return redistribuir_stock(df_nuevo, meses, progress_callback, motor=motor)
+
+        intactas = np.flatnonzero(~tocadas)
+        # Dentro de un grupo el destino depende del orden de las filas, y los
+        # motores que descuentan lo entregado dependen además del orden de
+        # las micro redes
+        mismo_orden = np.all(np.diff(posiciones[intactas]) > 0)
+        if motor in (MOTOR_INDICE, MOTOR_PRIORIDAD):
+            mismo_orden = mismo_orden and _orden_micro_redes(df_anterior) == _orden_micro_redes(df_nuevo)
+        if not mismo_orden:
+            return redistribuir_stock(df_nuevo, meses, progress_callback, motor=motor)
+        progress_callback(10)
+
+        # Fila del resultado anterior que corresponde a cada fila del DataFrame anterior
+        con_micro_red = df_anterior['micro red'].notna().to_numpy()
+        orden_anterior = np.argsort(df_anterior.index.to_numpy()[con_micro_red], kind='stable')
+        fila_resultado = np.full(len(df_anterior), -1, dtype=np.int64)
+        fila_resultado[np.flatnonzero(con_micro_red)[orden_anterior]] = np.arange(len(orden_anterior))
+
+        intactas = intactas[df_nuevo['micro red'].notna().to_numpy()[intactas]]
+        copiadas = resultado_anterior.iloc[fila_resultado[posiciones[intactas]]]
+
+        df_tocado = df_nuevo.iloc[np.flatnonzero(tocadas)]
+        recalculadas = MOTORES[motor](df_tocado.copy(), meses, lambda value: None)
+        progress_callback(90)
+
+        # Mismo orden que una corrida completa: el del índice del DataFrame nuevo
+        indices = np.concatenate([
+            df_nuevo.index.to_numpy()[intactas],
+            np.sort(df_tocado.index[df_tocado['micro red'].notna()].to_numpy()),
+        ])
+        with etapa('combinar'):
+            df_redistribuido = pd.concat([copiadas, recalculadas], ignore_index=True)
+            df_redistribuido = df_redistribuido.iloc[np.argsort(indices, kind='stable')].reset_index(drop=True)
+            categorizar(df_redistribuido, COLUMNAS_SALIDA_CATEGORICAS)
+        progress_callback(100)
+
+        return df_redistribuido
+    except RedistribucionCancelada:
+        raise
+    except Exception as e:
+        print(f"Error al redistribuir el stock de forma incremental: {e}")
+        return None
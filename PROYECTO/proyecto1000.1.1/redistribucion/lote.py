@@ -0,0 +1,157 @@
+import contextlib
+import glob
+import io
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .cli import SALIDA_ERROR_REDISTRIBUCION, SUFIJO_SALIDA, _archivo_salida, ejecutar
+from .motor import MOTOR_VECTORIZADO
+
+EXTENSIONES_LIBRO = ('.xlsx', '.xlsm', '.xls')
+# Cada cuánto el proceso principal revisa los avisos de avance de los workers
+SEGUNDOS_ENTRE_AVISOS = 0.1
+
+# Cola de avisos de avance del lote, heredada por cada proceso del pool
+_avisos = None
+
+
+def archivos_del_lote(origen):
+    # Una carpeta (sus libros, sin entrar en subcarpetas) o un patrón glob;
+    # en ambos casos solo libros Excel. Se saltan los resultados de corridas
+    # anteriores y los archivos de bloqueo que Excel deja abiertos (~$libro.xlsx).
+    if os.path.isdir(origen):
+        archivos = [os.path.join(origen, nombre) for nombre in os.listdir(origen)]
+    else:
+        archivos = glob.glob(origen)
+    return sorted(archivo for archivo in archivos
+                  if os.path.isfile(archivo)
+                  and archivo.lower().endswith(EXTENSIONES_LIBRO)
+                  and not os.path.basename(archivo).startswith('~$')
+                  and not os.path.splitext(archivo)[0].endswith(SUFIJO_SALIDA))
+
+
+def _iniciar_worker(avisos):
+    global _avisos
+    _avisos = avisos
+
+
+def _procesar_archivo(posicion, entrada, salida, opciones):
+    # Corre en un proceso del pool: la corrida completa de un libro. Lo que
+    # la corrida imprime se guarda para mostrarlo como mensaje del archivo.
+    ultimo = [-1]
+
+    def avisar(value):
+        if _avisos is not None and value != ultimo[0]:
+            ultimo[0] = value
+            _avisos.put((posicion, value))
+
+    salida_texto = io.StringIO()
+    inicio = time.perf_counter()
+    avisar(0)
+    try:
+        with contextlib.redirect_stdout(salida_texto), contextlib.redirect_stderr(salida_texto):
+            codigo, _ = ejecutar(entrada, salida, progress_callback=avisar, **opciones)
+    except Exception as e:
+        codigo = SALIDA_ERROR_REDISTRIBUCION
+        print(f"Error: {e}", file=salida_texto)
+    return {
+        'entrada': entrada,
+        'salida': salida,
+        'codigo': codigo,
+        'segundos': time.perf_counter() - inicio,
+        'mensajes': [linea for linea in salida_texto.getvalue().splitlines() if linea.strip()],
+    }
+
+
+def _resultado_fallido(entrada, salida, mensaje):
+    return {'entrada': entrada, 'salida': salida, 'codigo': SALIDA_ERROR_REDISTRIBUCION,
+            'segundos': 0.0, 'mensajes': [mensaje]}
+
+
+def _sin_avance(posicion, value):
+    pass
+
+
+def _ronda(posiciones, archivos, salidas, opciones, workers, resultados, progress_callback, archivo_callback,
+           cancelado):
+    # Reparte los libros en un pool y devuelve las posiciones que no
+    # terminaron porque un proceso murió (el pool queda roto para todos)
+    avisos = multiprocessing.Queue()
+    rotos = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(avisos,)) as pool:
+        futuros = {pool.submit(_procesar_archivo, posicion, archivos[posicion], salidas[posicion], opciones): posicion
+                   for posicion in posiciones}
+        pendientes = set(futuros)
+        while pendientes:
+            terminados, pendientes = wait(pendientes, timeout=SEGUNDOS_ENTRE_AVISOS, return_when=FIRST_COMPLETED)
+            while True:
+                try:
+                    posicion, value = avisos.get_nowait()
+                except queue.Empty:
+                    break
+                if resultados[posicion] is None:
+                    progress_callback(posicion, value)
+
+            if cancelado is not None and cancelado():
+                for futuro in pendientes:
+                    futuro.cancel()
+
+            for futuro in sorted(terminados, key=futuros.get):
+                posicion = futuros[futuro]
+                if futuro.cancelled():
+                    resultado = _resultado_fallido(archivos[posicion], salidas[posicion], "Cancelado antes de empezar.")
+                elif isinstance(futuro.exception(), BrokenProcessPool):
+                    rotos.append(posicion)
+                    continue
+                elif futuro.exception() is not None:
+                    resultado = _resultado_fallido(archivos[posicion], salidas[posicion],
+                                                   f"Error: {futuro.exception()}")
+                else:
+                    resultado = futuro.result()
+                resultados[posicion] = resultado
+                if archivo_callback is not None:
+                    archivo_callback(posicion, resultado)
+    avisos.close()
+    return sorted(rotos)
+
+
+def procesar_lote(archivos, meses=None, motor=MOTOR_VECTORIZADO, workers=None, usar_cache=True, separador=',',
+                  extension='.xlsx', progress_callback=None, archivo_callback=None, cancelado=None):
+    # Importa, redistribuye y exporta cada libro en un proceso del pool y
+    # escribe el resultado al lado (<libro>_redistribuido<extension>). Un
+    # libro que falla no detiene a los demás: cada uno termina con su
+    # código de salida y sus mensajes. progress_callback(posicion, avance)
+    # informa el avance de cada libro y archivo_callback(posicion, resultado)
+    # cada libro terminado; si cancelado() da True se descartan los libros que
+    # todavía no empezaron. Devuelve los resultados en el orden de `archivos`.
+    progress_callback = progress_callback or _sin_avance
+    opciones = {'meses': meses, 'motor': motor, 'usar_cache': usar_cache, 'separador': separador}
+    salidas = [_archivo_salida(entrada, extension) for entrada in archivos]
+    resultados = [None] * len(archivos)
+
+    restantes = list(range(len(archivos)))
+    workers = min(workers or os.cpu_count() or 1, max(len(archivos), 1))
+    while restantes:
+        rotos = _ronda(restantes, archivos, salidas, opciones, workers, resultados, progress_callback,
+                       archivo_callback, cancelado)
+        if rotos and cancelado is not None and cancelado():
+            for posicion in rotos:
+                resultados[posicion] = _resultado_fallido(archivos[posicion], salidas[posicion], "Cancelado.")
+                if archivo_callback is not None:
+                    archivo_callback(posicion, resultados[posicion])
+            break
+        if rotos and workers == 1:
+            # De a un libro por vez, el que estaba en curso es el que tiró el proceso
+            posicion = rotos.pop(0)
+            resultados[posicion] = _resultado_fallido(archivos[posicion], salidas[posicion],
+                                                      "El proceso terminó de forma inesperada (¿sin memoria?).")
+            if archivo_callback is not None:
+                archivo_callback(posicion, resultados[posicion])
+        # Con varios procesos no se sabe qué libro lo tiró: se reintentan de a uno
+        workers = 1
+        restantes = rotos
+    return resultados
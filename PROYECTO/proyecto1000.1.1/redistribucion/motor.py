@@ -0,0 +1,503 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from .demanda import MatrizDemanda
+from .esquema import aplicar_esquema, categorizar
+from .estados import clasificar_estados, determinar_estado, tipo_estado
+from .motores import (MOTOR_CLASICO, MOTOR_INDICE, MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED, MOTOR_PRIORIDAD,
+                      MOTOR_VECTORIZADO)
+from .perfil import etapa, medido
+
+SIN_EXTRACCION = "NO SE EXTRAE STOCK"
+SIN_TRASPASO = "NO SE TRASPASAN STOCK"
+
+# Las columnas de stock se guardan como números con nulos (Float64) y la
+# marca "SC" solo se escribe al mostrar o exportar el resultado
+COLUMNAS_STOCK = ['STOCK ACTUAL', 'STOCK A RECIBIR', 'STOCK FINAL']
+COLUMNA_SIN_CAMBIO = 'SIN CAMBIO'
+MARCA_SIN_CAMBIO = "SC"
+# Destino de un donante sin establecimiento; -1 queda para "ningún donante"
+DESTINO_SIN_NOMBRE = -2
+
+COLUMNAS_SALIDA_CATEGORICAS = ['MICRO RED', 'ESTABLECIMIENTO', 'COD-MEDICAMENTO', 'MEDICAMENTO',
+                               'ESTABLECIMIENTO DE DONDE SE EXTRAE EL STOCK',
+                               'ESTABLECIMIENTO A DONDE SE TRASPASA EL STOCK']
+
+
+class RedistribucionCancelada(Exception):
+    pass
+
+
+@medido('porcentaje cpa')
+def calcular_porcentaje_cpa(cpa):
+    try:
+        aplicar_esquema(cpa, ['cpa', 'total'])
+        cpa['ABASTECIMIENTO'] = (cpa['cpa'] / cpa['total']) * 100
+        return cpa
+    except Exception as e:
+        print(f"Error al calcular el porcentaje de CPA: {e}")
+        return cpa
+
+
+def _categoria_o_texto(categorica, mascara, texto):
+    # Misma categórica, con `texto` como categoría extra donde `mascara` es False
+    categorias = categorica.categories
+    if texto not in categorias:
+        categorias = categorias.append(pd.Index([texto]))
+    codigos = np.where(mascara, categorica.codes, categorias.get_loc(texto))
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def _preparar_columnas(df):
+    # Un DataFrame de importar_excel ya viene con el esquema aplicado y aquí
+    # no se convierte nada; uno armado a mano se convierte una sola vez
+    with etapa('preparar columnas'):
+        aplicar_esquema(df)
+        df['original_index'] = df.index
+
+
+def _redistribuir_clasico(df, meses, progress_callback, parcial_callback=None):
+    _preparar_columnas(df)
+
+    redistribucion = []
+    total_rows = len(df)
+    processed_rows = 0
+
+    for micro_red in df['micro red'].unique():
+        df_micro_red = df[df['micro red'] == micro_red]
+        inicio_micro_red = len(redistribucion)
+
+        for index, row in df_micro_red.iterrows():
+            stock_actual = row['stock']
+            abastecimiento = 0
+            stock_a_recibir = 0
+            stock_reutilizado = 0
+            establecimiento_origen = SIN_EXTRACCION
+            establecimiento_destino = SIN_TRASPASO
+            tipo_medicamento = row['tipo']
+
+            if stock_actual > 0:
+                for mes in meses:
+                    if mes in df.columns:
+                        salidas = row[mes]
+                        abastecimiento += salidas
+                        abastecimiento = min(abastecimiento, stock_actual)
+
+            medicamento = row['codigo']
+            otros_establecimientos = df[(
+                df['codigo'] == medicamento) &
+                (df['stock'] > 0) &
+                (df['establecimiento'] != row['establecimiento']) &
+                (df['tipo'] == tipo_medicamento)
+            ]
+
+            if abastecimiento > 0 and row['establecimiento'] in otros_establecimientos['establecimiento'].values:
+                stock_reutilizado = min(abastecimiento, stock_actual)
+                abastecimiento -= stock_reutilizado
+
+            if abastecimiento > 0:
+                establecimiento_origen = row['establecimiento']
+                for _, otro_row in otros_establecimientos.iterrows():
+                    stock_disponible = otro_row['stock']
+                    if abastecimiento > 0:
+                        for mes in meses:
+                            if mes in df.columns:
+                                salidas = row[mes]
+                                cantidad_a_recibir = min(salidas, stock_disponible, abastecimiento)
+
+                                stock_a_recibir += cantidad_a_recibir
+                                abastecimiento -= cantidad_a_recibir
+                                establecimiento_destino = otro_row['establecimiento']
+                                stock_disponible -= cantidad_a_recibir
+
+            disponibilidad = row['disponibilidad']
+            estado = determinar_estado(disponibilidad)
+
+            total = stock_a_recibir * row['precio'] if stock_a_recibir > 0 and pd.notna(row['precio']) else 0
+
+            redistribucion.append({
+                'MICRO RED': micro_red,
+                'ESTABLECIMIENTO': row['establecimiento'],
+                'COD-MEDICAMENTO': row['codigo'],
+                'MEDICAMENTO': row['medicamentos'],
+                'PRECIO': row['precio'],
+                'STOCK ACTUAL': stock_actual if total != 0 else None,
+                'ABASTECIMIENTO': row['cpa'],
+                'STOCK A RECIBIR': stock_a_recibir if stock_a_recibir > 0 else None,
+                'STOCK FINAL': (row['cpa'] + stock_a_recibir) if total != 0 else None,
+                'TOTAL': total,
+                'ESTABLECIMIENTO DE DONDE SE EXTRAE EL STOCK': establecimiento_origen,
+                'ESTABLECIMIENTO A DONDE SE TRASPASA EL STOCK': establecimiento_destino if abastecimiento > 0 else SIN_TRASPASO,
+                'DISPONIBILIDAD': disponibilidad,
+                'ESTADO': estado,
+                COLUMNA_SIN_CAMBIO: total == 0,
+                'original_index': row['original_index']
+            })
+
+            processed_rows += 1
+            progress_callback(int((processed_rows / total_rows) * 100))
+
+        if parcial_callback is not None and len(redistribucion) > inicio_micro_red:
+            df_parcial = pd.DataFrame(redistribucion[inicio_micro_red:]).drop(columns=['original_index'])
+            parcial_callback(micro_red, _tipar_columnas(df_parcial))
+
+    with etapa('armar resultado'):
+        df_redistribuido = _tipar_columnas(pd.DataFrame(redistribucion))
+        categorizar(df_redistribuido, COLUMNAS_SALIDA_CATEGORICAS)
+    with etapa('ordenar por original_index'):
+        df_redistribuido = df_redistribuido.sort_values(by='original_index').reset_index(drop=True)
+        df_redistribuido.drop(columns=['original_index'], inplace=True)
+
+    return df_redistribuido
+
+
+def _tipar_columnas(df):
+    for columna in COLUMNAS_STOCK:
+        df[columna] = df[columna].astype('Float64')
+    df['ESTADO'] = df['ESTADO'].astype(tipo_estado())
+    return df
+
+
+def resultado_para_presentacion(df):
+    # Vuelve a la forma de la planilla original: "SC" donde no hay
+    # movimiento y sin la columna de marca. La marca va en las celdas vacías
+    # de las filas sin cambio: lo recibido sin precio se muestra, y un STOCK
+    # FINAL con TOTAL pero sin cpa queda vacío, no "SC"
+    if COLUMNA_SIN_CAMBIO not in df.columns:
+        return df
+    sin_cambio = df[COLUMNA_SIN_CAMBIO].to_numpy(dtype=bool)
+    df = df.drop(columns=[COLUMNA_SIN_CAMBIO])
+    for columna in COLUMNAS_STOCK:
+        valores = pd.Series(df[columna].to_numpy(dtype=object, na_value=np.nan), index=df.index)
+        df[columna] = valores.where(~(sin_cambio & df[columna].isna().to_numpy()), MARCA_SIN_CAMBIO)
+    return df
+
+
+def _donantes_por_fila(df):
+    # Para cada fila: stock y cantidad de donantes del mismo (codigo, tipo)
+    # en otros establecimientos, y el código del último donante en el orden
+    # del DataFrame (el clásico deja como destino al último que recorre).
+    donante = (df['stock'] > 0) & df['codigo'].notna() & df['tipo'].notna()
+    stock_donante = df['stock'].where(donante, 0.0)
+    es_donante = donante.astype(np.int64)
+    grupo = [df['codigo'], df['tipo']]
+    grupo_establecimiento = grupo + [df['establecimiento']]
+
+    stock_grupo = stock_donante.groupby(grupo, observed=True).transform('sum').fillna(0.0)
+    stock_propio = stock_donante.groupby(grupo_establecimiento, observed=True).transform('sum').fillna(0.0)
+    donantes_grupo = es_donante.groupby(grupo, observed=True).transform('sum').fillna(0)
+    donantes_propios = es_donante.groupby(grupo_establecimiento, observed=True).transform('sum').fillna(0)
+
+    donantes_otros = (donantes_grupo - donantes_propios).to_numpy(dtype=np.int64)
+    stock_otros = np.where(donantes_otros > 0, (stock_grupo - stock_propio).to_numpy(dtype=float), 0.0)
+    stock_otros = np.maximum(stock_otros, 0.0)
+
+    posicion = pd.Series(np.arange(len(df), dtype=float), index=df.index)
+    establecimientos = df['establecimiento'].cat.codes.to_numpy()
+    ultimo = posicion.where(donante).groupby(grupo, observed=True).transform('max')
+    establecimiento_ultimo = np.where(
+        ultimo.notna(), establecimientos[ultimo.fillna(0).to_numpy(dtype=np.int64)], -2
+    )
+    # Como al comparar nombres, un establecimiento sin nombre (-1) nunca coincide
+    usar_ultimo = (establecimientos != establecimiento_ultimo) | (establecimientos < 0)
+    penultimo = posicion.where(donante & usar_ultimo).groupby(grupo, observed=True).transform('max')
+
+    posicion_destino = np.where(usar_ultimo, ultimo.to_numpy(), penultimo.to_numpy())
+    posicion_destino = np.nan_to_num(posicion_destino, nan=0.0).astype(np.int64)
+
+    return stock_otros, donantes_otros, establecimientos[posicion_destino]
+
+
+def _redistribuir_vectorizado(df, meses, progress_callback, parcial_callback=None):
+    # Cada fila solo depende de los donantes de su (codigo, tipo) y el
+    # bucle clásico no descuenta lo entregado entre filas, así que el
+    # resultado admite una forma cerrada: lo recibido es el mínimo entre
+    # la demanda y el stock de los demás establecimientos.
+    _preparar_columnas(df)
+    progress_callback(10)
+
+    with etapa('demanda'):
+        abastecimiento = _demanda_en_forma_cerrada(df, meses)
+    progress_callback(30)
+
+    with etapa('donantes'):
+        stock_otros, donantes_otros, destino = _donantes_por_fila(df)
+    progress_callback(60)
+
+    stock_a_recibir, destino = _recibido_en_forma_cerrada(abastecimiento, stock_otros, donantes_otros, destino)
+    df_redistribuido = _armar_resultado(df, abastecimiento, stock_a_recibir, destino)
+    progress_callback(100)
+
+    return df_redistribuido
+
+
+def _demanda_en_forma_cerrada(df, meses):
+    # La demanda de cada fila como la deja el bucle clásico antes de buscar
+    # donantes. Una fila sin establecimiento que también dona queda entre
+    # "los demás" (NaN != NaN), se abastece de su propio stock y no pide nada.
+    stock = df['stock'].to_numpy(dtype=float)
+    abastecimiento = MatrizDemanda(df, meses).abastecimiento(stock)
+    donante = (df['stock'] > 0) & df['codigo'].notna() & df['tipo'].notna()
+    propia = (donante & df['establecimiento'].isna()).to_numpy()
+    return np.where(propia, 0.0, abastecimiento)
+
+
+def _recibido_en_forma_cerrada(abastecimiento, stock_otros, donantes_otros, destino):
+    # Lo recibido y el donante de destino (-1 si no hay otros donantes) a
+    # partir de los agregados de _donantes_por_fila
+    con_demanda = abastecimiento > 0
+    stock_a_recibir = np.where(con_demanda, np.minimum(abastecimiento, stock_otros), 0.0)
+    destino = np.where(destino < 0, DESTINO_SIN_NOMBRE, destino)
+    return stock_a_recibir, np.where(donantes_otros > 0, destino, -1)
+
+
+class IndiceDonantes:
+    # Stock restante de los donantes de cada (codigo, tipo), en el orden del
+    # DataFrame. Lo entregado se descuenta aquí, de modo que un donante
+    # agotado no vuelve a ofrecerse dentro de la misma corrida. Los
+    # establecimientos se manejan por su código de categoría.
+
+    def __init__(self, df):
+        donante = (df['stock'] > 0) & df['codigo'].notna() & df['tipo'].notna()
+        posiciones = np.flatnonzero(donante.to_numpy())
+        establecimientos = df['establecimiento'].cat.codes.to_numpy()
+        stock = df['stock'].to_numpy(dtype=float)
+
+        # Por grupo: establecimientos, stock restante y el primer donante
+        # que aún tiene stock (los anteriores ya se agotaron)
+        self.grupos = {}
+        claves = df[['codigo', 'tipo']].iloc[posiciones]
+        for clave, filas in claves.groupby(['codigo', 'tipo'], sort=False, observed=True).indices.items():
+            pos = posiciones[filas]
+            self.grupos[clave] = [establecimientos[pos].tolist(), stock[pos].tolist(), 0]
+
+    def extraer(self, codigo, tipo, establecimiento, cantidad):
+        # Toma hasta `cantidad` de los demás establecimientos, en orden, y
+        # devuelve lo entregado junto al último donante que aportó stock (-1 si
+        # ninguno aportó).
+        grupo = self.grupos.get((codigo, tipo))
+        if grupo is None or not cantidad > 0:
+            return 0.0, -1
+        establecimientos, restante, inicio = grupo
+        total_donantes = len(restante)
+        while inicio < total_donantes and restante[inicio] <= 0:
+            inicio += 1
+        grupo[2] = inicio
+
+        recibido = 0.0
+        ultimo_donante = -1
+        for i in range(inicio, total_donantes):
+            if recibido >= cantidad:
+                break
+            if restante[i] > 0 and establecimientos[i] != establecimiento:
+                entrega = min(restante[i], cantidad - recibido)
+                restante[i] -= entrega
+                recibido += entrega
+                ultimo_donante = establecimientos[i]
+        return recibido, ultimo_donante
+
+
+def _meses_sobrantes(stock, cpa):
+    # Sin consumo (cpa vacío o 0) todo el stock sobra
+    return stock / cpa if cpa > 0 else np.inf
+
+
+class DonantesPorPrioridad:
+    # Donantes de cada (codigo, tipo) en un montículo ordenado por meses de
+    # sobrante (stock restante sobre cpa), el mayor arriba y, a igual
+    # sobrante, en el orden del DataFrame. Cada pedido se atiende desde la
+    # cima: entrega primero a quien más le sobra, en menos traspasos y más
+    # grandes. Misma interfaz que IndiceDonantes.
+
+    def __init__(self, df):
+        donante = (df['stock'] > 0) & df['codigo'].notna() & df['tipo'].notna()
+        posiciones = np.flatnonzero(donante.to_numpy())
+        establecimientos = df['establecimiento'].cat.codes.to_numpy()[posiciones]
+        stock = df['stock'].to_numpy(dtype=float)[posiciones]
+        cpa = df['cpa'].to_numpy(dtype=float)[posiciones]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sobrante = np.where(cpa > 0, stock / cpa, np.inf)
+
+        # Cada donante es (-meses de sobrante, orden, establecimiento, stock
+        # restante, cpa), con números de Python: el montículo los compara
+        # mucho más rápido que escalares de numpy
+        self.grupos = {}
+        claves = df[['codigo', 'tipo']].iloc[posiciones]
+        for clave, filas in claves.groupby(['codigo', 'tipo'], sort=False, observed=True).indices.items():
+            monticulo = list(zip((-sobrante[filas]).tolist(), filas.tolist(), establecimientos[filas].tolist(),
+                                 stock[filas].tolist(), cpa[filas].tolist()))
+            heapq.heapify(monticulo)
+            self.grupos[clave] = monticulo
+
+    def extraer(self, codigo, tipo, establecimiento, cantidad):
+        # Toma hasta `cantidad` desde la cima y devuelve lo entregado junto
+        # al donante que más aportó (-1 si ninguno aportó). Los donantes del
+        # mismo establecimiento se apartan y vuelven al montículo al final.
+        monticulo = self.grupos.get((codigo, tipo))
+        if not monticulo or not cantidad > 0:
+            return 0.0, -1
+
+        recibido = 0.0
+        principal = -1
+        mayor_entrega = 0.0
+        apartados = []
+        while monticulo and recibido < cantidad:
+            donante = heapq.heappop(monticulo)
+            _, orden, otro, restante, cpa = donante
+            if otro == establecimiento:
+                apartados.append(donante)
+                continue
+            entrega = min(restante, cantidad - recibido)
+            recibido += entrega
+            if entrega > mayor_entrega:
+                principal, mayor_entrega = otro, entrega
+            if restante > entrega:
+                # Solo queda stock si el pedido se completó: vuelve con su nuevo sobrante
+                heapq.heappush(monticulo, (-_meses_sobrantes(restante - entrega, cpa), orden, otro,
+                                           restante - entrega, cpa))
+        for donante in apartados:
+            heapq.heappush(monticulo, donante)
+        return recibido, principal
+
+
+def _redistribuir_con_donantes(df, meses, progress_callback, parcial_callback, donantes):
+    _preparar_columnas(df)
+
+    stock = df['stock'].to_numpy(dtype=float)
+    with etapa('demanda'):
+        abastecimiento = MatrizDemanda(df, meses).abastecimiento(stock)
+    with etapa('índice de donantes'):
+        indice = donantes(df)
+
+    codigos = df['codigo'].to_numpy()
+    tipos = df['tipo'].to_numpy()
+    # Quien pide sin nombre (-1) no se confunde con un donante sin nombre
+    establecimientos = df['establecimiento'].cat.codes.to_numpy()
+    establecimientos = np.where(establecimientos < 0, DESTINO_SIN_NOMBRE, establecimientos).tolist()
+    # Escalares de Python en el bucle: los de numpy son lentos de a uno
+    cantidades = abastecimiento.tolist()
+    stock_a_recibir = np.zeros(len(df))
+    destino = np.full(len(df), -1, dtype=np.int64)
+
+    # Mismo recorrido que el bucle clásico: micro red por micro red, en
+    # orden de aparición, y dentro de cada una en el orden del DataFrame.
+    # Si la columna es categórica, el orden de las categorías manda (así
+    # una partición conserva el orden de la corrida completa).
+    por_categoria = isinstance(df['micro red'].dtype, pd.CategoricalDtype)
+    micro_redes = df.groupby('micro red', sort=por_categoria, observed=True).indices
+    total_rows = sum(len(posiciones) for posiciones in micro_redes.values())
+    paso = max(total_rows // 100, 1)
+    processed_rows = 0
+    with etapa('asignar'):
+        for micro_red, posiciones in micro_redes.items():
+            for posicion in posiciones.tolist():
+                if cantidades[posicion] > 0:
+                    stock_a_recibir[posicion], destino[posicion] = indice.extraer(
+                        codigos[posicion], tipos[posicion], establecimientos[posicion], cantidades[posicion]
+                    )
+                processed_rows += 1
+                if processed_rows % paso == 0:
+                    progress_callback(int((processed_rows / total_rows) * 100))
+
+            if parcial_callback is not None:
+                parcial_callback(micro_red, _armar_resultado(
+                    df.iloc[posiciones], abastecimiento[posiciones], stock_a_recibir[posiciones], destino[posiciones]
+                ))
+
+    df_redistribuido = _armar_resultado(df, abastecimiento, stock_a_recibir, destino)
+    progress_callback(100)
+
+    return df_redistribuido
+
+
+def _redistribuir_indice(df, meses, progress_callback, parcial_callback=None):
+    return _redistribuir_con_donantes(df, meses, progress_callback, parcial_callback, IndiceDonantes)
+
+
+def _redistribuir_prioridad(df, meses, progress_callback, parcial_callback=None):
+    return _redistribuir_con_donantes(df, meses, progress_callback, parcial_callback, DonantesPorPrioridad)
+
+
+@medido('armar resultado')
+def _armar_resultado(df, abastecimiento, stock_a_recibir, destino):
+    # Arma las columnas de salida del bucle clásico a partir de los arreglos
+    # por fila; `destino` trae el código del establecimiento donante,
+    # DESTINO_SIN_NOMBRE si el donante no tiene establecimiento, o -1 donde
+    # ningún donante entregó stock.
+    con_demanda = abastecimiento > 0
+    pendiente = np.where(con_demanda, abastecimiento - stock_a_recibir, 0.0)
+
+    stock = df['stock'].to_numpy(dtype=float)
+    precio = df['precio'].to_numpy(dtype=float)
+    cpa = df['cpa'].to_numpy()
+    cpa_numerico = df['cpa'].to_numpy(dtype=float)
+    establecimientos = df['establecimiento'].array
+    recibe = stock_a_recibir > 0
+    total = np.where(recibe & ~np.isnan(precio), stock_a_recibir * precio, 0)
+    con_total = total != 0
+    con_destino = (pendiente > 0) & (destino != -1)
+    destinos = pd.Categorical.from_codes(np.where(con_destino & (destino >= 0), destino, -1),
+                                         dtype=establecimientos.dtype)
+
+    df_redistribuido = pd.DataFrame({
+        'MICRO RED': df['micro red'].array,
+        'ESTABLECIMIENTO': establecimientos,
+        'COD-MEDICAMENTO': df['codigo'].array,
+        'MEDICAMENTO': df['medicamentos'].array,
+        'PRECIO': precio,
+        'STOCK ACTUAL': pd.arrays.FloatingArray(stock, ~con_total),
+        'ABASTECIMIENTO': cpa,
+        'STOCK A RECIBIR': pd.arrays.FloatingArray(stock_a_recibir, ~recibe),
+        'STOCK FINAL': pd.arrays.FloatingArray(cpa_numerico + stock_a_recibir, ~con_total),
+        'TOTAL': total,
+        'ESTABLECIMIENTO DE DONDE SE EXTRAE EL STOCK': _categoria_o_texto(establecimientos, con_demanda, SIN_EXTRACCION),
+        'ESTABLECIMIENTO A DONDE SE TRASPASA EL STOCK': _categoria_o_texto(destinos, con_destino, SIN_TRASPASO),
+        'DISPONIBILIDAD': df['disponibilidad'].to_numpy(),
+        'ESTADO': clasificar_estados(df['disponibilidad']),
+        COLUMNA_SIN_CAMBIO: ~con_total,
+        'original_index': df['original_index'].to_numpy()
+    })
+
+    # Las filas sin micro red no entran en ningún grupo del bucle clásico
+    df_redistribuido = df_redistribuido[df['micro red'].notna().to_numpy()]
+    with etapa('ordenar por original_index'):
+        df_redistribuido = df_redistribuido.sort_values(by='original_index', kind='stable').reset_index(drop=True)
+        df_redistribuido.drop(columns=['original_index'], inplace=True)
+
+    return df_redistribuido
+
+
+def _redistribuir_optimo(df, meses, progress_callback, parcial_callback=None, preferir_micro_red=False):
+    # SciPy es opcional: se importa solo al usar este motor
+    from .optimo import redistribuir_optimo
+    return redistribuir_optimo(df, meses, progress_callback, preferir_micro_red)
+
+
+def _redistribuir_optimo_micro_red(df, meses, progress_callback, parcial_callback=None):
+    return _redistribuir_optimo(df, meses, progress_callback, parcial_callback, preferir_micro_red=True)
+
+
+MOTORES = {
+    MOTOR_CLASICO: _redistribuir_clasico,
+    MOTOR_VECTORIZADO: _redistribuir_vectorizado,
+    MOTOR_INDICE: _redistribuir_indice,
+    MOTOR_PRIORIDAD: _redistribuir_prioridad,
+    MOTOR_OPTIMO: _redistribuir_optimo,
+    MOTOR_OPTIMO_MICRO_RED: _redistribuir_optimo_micro_red,
+}
+
+
+@medido('redistribuir')
+def redistribuir_stock(df, meses, progress_callback, motor=MOTOR_VECTORIZADO, parcial_callback=None, workers=None):
+    try:
+        if workers is not None and workers > 1:
+            from .paralelo import redistribuir_en_paralelo
+            return redistribuir_en_paralelo(df, meses, progress_callback, motor, workers)
+        return MOTORES[motor](df, meses, progress_callback, parcial_callback)
+    except RedistribucionCancelada:
+        raise
+    except Exception as e:
+        print(f"Error al redistribuir el stock: {e}")
+        return None
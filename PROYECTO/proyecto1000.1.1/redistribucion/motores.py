@@ -0,0 +1,14 @@
+import importlib.util
+
+# Nombres de los motores, sin NumPy ni pandas: la interfaz arma su menú
+# antes de cargar las librerías de cálculo
+MOTOR_CLASICO = "clasico"
+MOTOR_VECTORIZADO = "vectorizado"
+MOTOR_INDICE = "indice"
+MOTOR_PRIORIDAD = "prioridad"
+MOTOR_OPTIMO = "optimo"
+MOTOR_OPTIMO_MICRO_RED = "optimo_micro_red"
+
+
+def solver_disponible():
+    return importlib.util.find_spec('scipy') is not None
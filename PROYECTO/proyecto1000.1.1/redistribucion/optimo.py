@@ -0,0 +1,372 @@
+import numpy as np
+import pandas as pd
+
+from .demanda import MatrizDemanda
+from .motor import DESTINO_SIN_NOMBRE, _armar_resultado, _preparar_columnas
+from .motores import solver_disponible
+from .perfil import etapa, medido
+
+# Cantidades menores se consideran ruido numérico del solver; la
+# solución se redondea a DECIMALES (con stock y salidas enteras la
+# asignación óptima es entera)
+TOLERANCIA = 1e-7
+DECIMALES = 6
+
+# Variables por cada llamada al solver
+VARIABLES_POR_TRAMO = 20000
+
+
+def _pares_por_bloque(bloque_a, bloque_b):
+    # Todos los pares (a, b) con el mismo bloque; ambos arreglos ordenados
+    desde = np.searchsorted(bloque_b, bloque_a, 'left')
+    hasta = np.searchsorted(bloque_b, bloque_a, 'right')
+    cantidad = hasta - desde
+    a = np.repeat(np.arange(len(bloque_a)), cantidad)
+    inicio = np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+    b = np.repeat(desde, cantidad) + np.arange(cantidad.sum()) - inicio
+    return a, b
+
+
+def _zonas(micro_red, establecimiento, micro_redes, establecimientos):
+    # Micro redes unidas cuando comparten algún establecimiento: cada
+    # establecimiento queda en una sola zona y, como entre zonas el stock
+    # pasa por nodos, así nunca se abastece a sí mismo por esa vía
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    con_establecimiento = establecimiento >= 0
+    filas = micro_red[con_establecimiento]
+    columnas = micro_redes + establecimiento[con_establecimiento]
+    total = micro_redes + establecimientos
+    grafo = sparse.csr_matrix((np.ones(len(filas)), (filas, columnas)), shape=(total, total))
+    componentes = connected_components(grafo, directed=False)[1][:micro_redes]
+    return np.unique(componentes, return_inverse=True)[1]
+
+
+class _Red:
+    # Red de transporte de todos los grupos (codigo, tipo) a la vez. Dentro
+    # de una zona (una micro red, salvo que compartan establecimientos)
+    # cada par pedido-donante de distinto establecimiento es un arco; entre
+    # zonas el stock pasa por un único nodo por grupo. Para que una zona no
+    # se abastezca a sí misma por ese nodo basta con que lo que entrega más
+    # lo que recibe no supere el total del grupo, así que las variables
+    # crecen con las filas y no con los pares de zonas. Variables, en orden:
+    # arcos locales (x), recibido desde otras zonas (r), entregado a otras
+    # zonas (s) y total entre zonas por grupo (t).
+
+    def __init__(self, df, abastecimiento):
+        grupo = df.groupby(['codigo', 'tipo'], sort=False, observed=True).ngroup().to_numpy()
+        # Las filas sin micro red van a la micro red 0
+        micro_red = df['micro red'].cat.codes.to_numpy().astype(np.int64) + 1
+        establecimiento = df['establecimiento'].cat.codes.to_numpy().astype(np.int64)
+        stock = df['stock'].to_numpy(dtype=float)
+        micro_redes = len(df['micro red'].cat.categories) + 1
+        zona = _zonas(micro_red, establecimiento, micro_redes, len(df['establecimiento'].cat.categories))
+
+        # Las filas sin micro red no piden (no salen en el resultado) pero
+        # sí donan
+        pide = np.flatnonzero((abastecimiento > 0) & (grupo >= 0) & (micro_red > 0))
+        dona = np.flatnonzero((stock > 0) & (grupo >= 0))
+        bloque = grupo * micro_redes + zona[micro_red]
+        self.pide = pide[np.argsort(bloque[pide], kind='stable')]
+        self.dona = dona[np.argsort(bloque[dona], kind='stable')]
+        bloque_pide = bloque[self.pide]
+        bloque_dona = bloque[self.dona]
+        self.demanda = abastecimiento[self.pide]
+        self.oferta = stock[self.dona]
+
+        a, b = _pares_por_bloque(bloque_pide, bloque_dona)
+        distinto = establecimiento[self.pide[a]] != establecimiento[self.dona[b]]
+        self.arco_pide = a[distinto]
+        self.arco_dona = b[distinto]
+        # Arcos locales que igual cruzan micro redes, cuando la zona une varias
+        self.arco_cruza = micro_red[self.pide[self.arco_pide]] != micro_red[self.dona[self.arco_dona]]
+
+        # Un nodo por (grupo, zona) y los grupos numerados desde 0
+        nodos, nodo = np.unique(np.concatenate([bloque_pide, bloque_dona]), return_inverse=True)
+        self.nodo_pide = nodo[:len(self.pide)]
+        self.nodo_dona = nodo[len(self.pide):]
+        self.grupo_nodo = np.unique(nodos // micro_redes, return_inverse=True)[1]
+        self.grupo_pide = self.grupo_nodo[self.nodo_pide]
+        self.grupo_dona = self.grupo_nodo[self.nodo_dona]
+
+    def _columnas(self):
+        x, p, d, g = len(self.arco_pide), len(self.pide), len(self.dona), self.grupo_nodo.max() + 1
+        return x, p, d, g, np.arange(x), x + np.arange(p), x + p + np.arange(d), x + p + d + np.arange(g)
+
+    def restricciones(self):
+        from scipy import sparse
+
+        x, p, d, g, cx, cr, cs, ct = self._columnas()
+        total = x + p + d + g
+        nodos = len(self.grupo_nodo)
+
+        # Lo recibido no supera lo pedido, lo entregado no supera el stock y
+        # ninguna zona mueve más que el total de su grupo
+        filas = np.concatenate([self.arco_pide, np.arange(p), p + self.arco_dona, p + np.arange(d),
+                                p + d + self.nodo_dona, p + d + self.nodo_pide, p + d + np.arange(nodos)])
+        columnas = np.concatenate([cx, cr, cx, cs, cs, cr, ct[self.grupo_nodo]])
+        valores = np.concatenate([np.ones(2 * x + p + 2 * d + p), -np.ones(nodos)])
+        a_ub = sparse.csr_matrix((valores, (filas, columnas)), shape=(p + d + nodos, total))
+        b_ub = np.concatenate([self.demanda, self.oferta, np.zeros(nodos)])
+
+        # Lo entregado y lo recibido entre zonas suman el total del grupo
+        filas = np.concatenate([self.grupo_dona, np.arange(g), g + self.grupo_pide, g + np.arange(g)])
+        columnas = np.concatenate([cs, ct, cr, ct])
+        valores = np.concatenate([np.ones(d), -np.ones(g), np.ones(p), -np.ones(g)])
+        a_eq = sparse.csr_matrix((valores, (filas, columnas)), shape=(2 * g, total))
+        return a_ub, b_ub, a_eq, np.zeros(2 * g)
+
+    def grupos(self):
+        # Grupo de cada variable y de cada restricción, para resolver por tramos
+        g = self.grupo_nodo.max() + 1
+        columnas = np.concatenate([self.grupo_pide[self.arco_pide], self.grupo_pide, self.grupo_dona, np.arange(g)])
+        filas_ub = np.concatenate([self.grupo_pide, self.grupo_dona, self.grupo_nodo])
+        return columnas, filas_ub, np.concatenate([np.arange(g), np.arange(g)])
+
+    def recibido(self, valores):
+        # Total recibido por cada fila que pide
+        x, p, d, g, cx, cr, cs, ct = self._columnas()
+        return np.bincount(self.arco_pide, valores[cx], minlength=p) + valores[cr]
+
+
+def _linprog(costo, a_ub, b_ub, a_eq, b_eq):
+    from scipy.optimize import linprog
+
+    resultado = linprog(costo, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=(0, None), method='highs')
+    if resultado.status != 0:
+        raise RuntimeError(f"el solver no encontró solución: {resultado.message}")
+    return resultado.x
+
+
+def _partir(tramo, tramos):
+    # Índices de cada tramo, en orden
+    orden = np.argsort(tramo, kind='stable')
+    return np.split(orden, np.searchsorted(tramo[orden], np.arange(1, tramos)))
+
+
+def _resolver(red, preferir_micro_red, progress_callback):
+    from scipy import sparse
+
+    x, p, d, g, cx, cr, cs, ct = red._columnas()
+    total = x + p + d + g
+    a_ub, b_ub, a_eq, b_eq = red.restricciones()
+    grupo_columna, grupo_ub, grupo_eq = red.grupos()
+
+    # Primero lo máximo que se puede atender; después, si se pide, lo
+    # mínimo entre micro redes sin atender menos en ningún grupo
+    maximo = np.zeros(total)
+    maximo[cx] = -1
+    maximo[cr] = -1
+    cruce = np.zeros(total)
+    cruce[ct] = 1
+    cruce[cx] = red.arco_cruza
+    filas = np.concatenate([red.grupo_pide[red.arco_pide], red.grupo_pide])
+    a_atendido = sparse.csr_matrix((-np.ones(len(filas)), (filas, np.concatenate([cx, cr]))), shape=(g, total))
+
+    # Los grupos son independientes y el simplex escala peor que lineal,
+    # así que se resuelven por tramos de grupos consecutivos
+    tramo = np.cumsum(np.bincount(grupo_columna, minlength=g)) // VARIABLES_POR_TRAMO
+    tramo = np.unique(tramo, return_inverse=True)[1]
+    tramos = tramo.max() + 1
+    partes = zip(_partir(tramo[grupo_columna], tramos), _partir(tramo[grupo_ub], tramos),
+                 _partir(tramo[grupo_eq], tramos), _partir(tramo, tramos))
+
+    valores = np.zeros(total)
+    for i, (columnas, filas_ub, filas_eq, grupos) in enumerate(partes):
+        tramo_ub = a_ub[filas_ub][:, columnas]
+        tramo_eq = a_eq[filas_eq][:, columnas]
+        resultado = _linprog(maximo[columnas], tramo_ub, b_ub[filas_ub], tramo_eq, b_eq[filas_eq])
+        if preferir_micro_red and cruce[columnas] @ resultado > TOLERANCIA:
+            tramo_atendido = a_atendido[grupos][:, columnas]
+            resultado = _linprog(cruce[columnas], sparse.vstack([tramo_ub, tramo_atendido]),
+                                 np.concatenate([b_ub[filas_ub], TOLERANCIA + tramo_atendido @ resultado]),
+                                 tramo_eq, b_eq[filas_eq])
+        valores[columnas] = resultado
+        progress_callback(10 + 70 * (i + 1) // tramos)
+
+    return np.where(valores > TOLERANCIA, np.round(valores, DECIMALES), 0.0)
+
+
+def _mas_cargada(cantidades, carga, excepto):
+    # La zona más cargada, sin contar `excepto`, que todavía tiene algo que
+    # entregar o recibir según `cantidades`; None si no queda ninguna
+    zonas = (zona for zona in range(len(carga)) if zona != excepto and cantidades[zona] > TOLERANCIA)
+    return max(zonas, key=carga.__getitem__, default=None)
+
+
+def _siguiente_flujo(salidas, entradas, carga):
+    # (origen, destino) del próximo flujo: la zona más cargada con la más
+    # cargada de las demás que puede ocupar el otro extremo
+    primera = max(range(len(carga)), key=carga.__getitem__)
+    if salidas[primera] > TOLERANCIA:
+        return primera, _mas_cargada(entradas, carga, primera)
+    return _mas_cargada(salidas, carga, primera), primera
+
+
+def _cantidad_del_flujo(origen, destino, salidas, entradas, carga, total):
+    # Lo que se mueve de origen a destino: lo más posible sin que otra zona
+    # quede con más carga que el total que resta, porque esa zona tendría
+    # que abastecerse a sí misma
+    resto = max((carga[zona] for zona in range(len(carga)) if zona != origen and zona != destino), default=0)
+    return min(salidas[origen], entradas[destino], max(total - resto, TOLERANCIA))
+
+
+def _entre_zonas(salidas, entradas):
+    # Reparte el total de un grupo en flujos (zona origen, zona destino,
+    # cantidad) con origen distinto de destino; salidas y entradas son
+    # listas por zona. Es posible porque ninguna zona mueve más que el
+    # total (la carga de una zona es lo que entrega más lo que recibe)
+    salidas = list(salidas)
+    entradas = list(entradas)
+    carga = [salida + entrada for salida, entrada in zip(salidas, entradas)]
+    total = sum(salidas)
+    flujos = []
+    while total > TOLERANCIA:
+        origen, destino = _siguiente_flujo(salidas, entradas, carga)
+        if origen is None or destino is None:
+            break
+        cantidad = _cantidad_del_flujo(origen, destino, salidas, entradas, carga, total)
+        flujos.append((origen, destino, cantidad))
+        salidas[origen] -= cantidad
+        entradas[destino] -= cantidad
+        carga[origen] -= cantidad
+        carga[destino] -= cantidad
+        total -= cantidad
+    return flujos
+
+
+def _proxima_pendiente(pendientes, posicion):
+    # Primera entrada desde `posicion` a la que todavía le queda cantidad
+    while posicion < len(pendientes) and pendientes[posicion][1] <= TOLERANCIA:
+        posicion += 1
+    return posicion
+
+
+def _emparejar(ofertas, demandas):
+    # Esquina noroeste: reparte las ofertas entre las demandas en orden;
+    # ambas listas son (índice, cantidad) y suman lo mismo. Cada par agota
+    # la oferta o la demanda actual y se pasa a la siguiente
+    ofertas = [list(oferta) for oferta in ofertas]
+    demandas = [list(demanda) for demanda in demandas]
+    pares = []
+    i = _proxima_pendiente(ofertas, 0)
+    j = _proxima_pendiente(demandas, 0)
+    while i < len(ofertas) and j < len(demandas):
+        cantidad = min(ofertas[i][1], demandas[j][1])
+        pares.append((ofertas[i][0], demandas[j][0], cantidad))
+        ofertas[i][1] -= cantidad
+        demandas[j][1] -= cantidad
+        i = _proxima_pendiente(ofertas, i)
+        j = _proxima_pendiente(demandas, j)
+    return pares
+
+
+def _por_nodo(nodos, indices, cantidades):
+    agrupado = {}
+    for nodo, indice, cantidad in zip(nodos, indices, cantidades):
+        if cantidad > 0:
+            agrupado.setdefault(nodo, []).append((indice, cantidad))
+    return agrupado
+
+
+@medido('traspasos')
+def _traspasos(red, valores):
+    # Lista (fila donante, fila que recibe, cantidad): los arcos locales
+    # tal cual y el total de cada grupo repartido entre zonas, y en cada
+    # zona entre sus donantes y sus pedidos
+    x, p, d, g, cx, cr, cs, ct = red._columnas()
+    local = valores[cx] > 0
+    donante = [red.dona[red.arco_dona[local]]]
+    receptor = [red.pide[red.arco_pide[local]]]
+    cantidad = [valores[cx][local]]
+
+    nodos = len(red.grupo_nodo)
+    salidas = np.bincount(red.nodo_dona, valores[cs], minlength=nodos)
+    entradas = np.bincount(red.nodo_pide, valores[cr], minlength=nodos)
+    # Los nodos están ordenados por grupo
+    limites = np.searchsorted(red.grupo_nodo, np.arange(g + 1))
+    flujos = []
+    for grupo in np.flatnonzero(valores[ct] > 0):
+        desde, hasta = limites[grupo], limites[grupo + 1]
+        flujos.extend((desde + origen, desde + destino, cantidad) for origen, destino, cantidad
+                      in _entre_zonas(salidas[desde:hasta].tolist(), entradas[desde:hasta].tolist()))
+
+    # De cada zona de origen: sus donantes contra sus flujos salientes
+    donantes_salida = _por_nodo(red.nodo_dona, red.dona, valores[cs])
+    flujos_salida = _por_nodo([origen for origen, _, _ in flujos], range(len(flujos)), [c for _, _, c in flujos])
+    piezas = []
+    for nodo, salientes in flujos_salida.items():
+        piezas.extend(_emparejar(donantes_salida.get(nodo, []), salientes))
+
+    # En cada zona de destino: las piezas que llegan contra sus pedidos
+    llegadas = _por_nodo([flujos[flujo][1] for _, flujo, _ in piezas],
+                         [fila for fila, _, _ in piezas], [c for _, _, c in piezas])
+    pedidos_entrada = _por_nodo(red.nodo_pide, red.pide, valores[cr])
+    for nodo, llegada in llegadas.items():
+        pares = _emparejar(llegada, pedidos_entrada.get(nodo, []))
+        if pares:
+            filas_donante, filas_receptor, cantidades = zip(*pares)
+            donante.append(np.array(filas_donante))
+            receptor.append(np.array(filas_receptor))
+            cantidad.append(np.array(cantidades))
+
+    return pd.DataFrame({
+        'donante': np.concatenate(donante).astype(np.int64),
+        'receptor': np.concatenate(receptor).astype(np.int64),
+        'cantidad': np.concatenate(cantidad).astype(float),
+    })
+
+
+def _calcular(df, meses, progress_callback, preferir_micro_red):
+    if not solver_disponible():
+        raise RuntimeError("el motor óptimo necesita scipy (pip install scipy)")
+    _preparar_columnas(df)
+    stock = df['stock'].to_numpy(dtype=float)
+    with etapa('demanda'):
+        abastecimiento = MatrizDemanda(df, meses).abastecimiento(stock)
+    with etapa('armar red'):
+        red = _Red(df, abastecimiento)
+    progress_callback(10)
+    with etapa('solver'):
+        valores = _resolver(red, preferir_micro_red, progress_callback) if len(red.pide) and len(red.dona) else None
+    return abastecimiento, red, valores
+
+
+def traspasos_optimos(df, meses, preferir_micro_red=False):
+    # Detalle de la asignación óptima: un traspaso por donante y destino
+    abastecimiento, red, valores = _calcular(df, meses, lambda value: None, preferir_micro_red)
+    columnas = ['COD-MEDICAMENTO', 'TIPO', 'ESTABLECIMIENTO ORIGEN', 'MICRO RED ORIGEN',
+                'ESTABLECIMIENTO DESTINO', 'MICRO RED DESTINO', 'CANTIDAD']
+    if valores is None:
+        return pd.DataFrame(columns=columnas)
+    traspasos = _traspasos(red, valores)
+    origen = df.iloc[traspasos['donante'].to_numpy()]
+    destino = df.iloc[traspasos['receptor'].to_numpy()]
+    return pd.DataFrame(dict(zip(columnas, [
+        destino['codigo'].array, destino['tipo'].array,
+        origen['establecimiento'].array, origen['micro red'].array,
+        destino['establecimiento'].array, destino['micro red'].array,
+        traspasos['cantidad'].to_numpy(),
+    ])))
+
+
+def redistribuir_optimo(df, meses, progress_callback, preferir_micro_red=False):
+    # Asignación de costo mínimo por (codigo, tipo): atiende lo máximo
+    # posible con el stock de los demás establecimientos y, si se pide,
+    # con la menor cantidad traspasada entre micro redes. Como destino se
+    # informa el donante que más aportó.
+    abastecimiento, red, valores = _calcular(df, meses, progress_callback, preferir_micro_red)
+    stock_a_recibir = np.zeros(len(df))
+    destino = np.full(len(df), -1, dtype=np.int64)
+    if valores is not None:
+        stock_a_recibir[red.pide] = red.recibido(valores)
+        traspasos = _traspasos(red, valores).sort_values('cantidad', ascending=False, kind='stable')
+        principal = traspasos.drop_duplicates('receptor')
+        establecimientos = df['establecimiento'].cat.codes.to_numpy()
+        establecimientos = np.where(establecimientos < 0, DESTINO_SIN_NOMBRE, establecimientos)
+        destino[principal['receptor'].to_numpy()] = establecimientos[principal['donante'].to_numpy()]
+
+    df_redistribuido = _armar_resultado(df, abastecimiento, stock_a_recibir, destino)
+    progress_callback(100)
+    return df_redistribuido
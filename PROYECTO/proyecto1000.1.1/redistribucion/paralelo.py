@@ -0,0 +1,104 @@
+import multiprocessing
+import queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from .esquema import categorizar
+from .motor import COLUMNAS_SALIDA_CATEGORICAS, MOTORES, _preparar_columnas
+
+# Particiones por worker: más de una para que la carga se reparta aunque
+# los grupos tengan tamaños muy distintos
+PARTICIONES_POR_WORKER = 4
+# Cada cuánto el proceso principal revisa los avisos de avance de las particiones
+SEGUNDOS_ENTRE_AVISOS = 0.1
+
+# Cola de avisos de avance, heredada por cada proceso del pool
+_avisos = None
+
+
+def _iniciar_worker(avisos):
+    global _avisos
+    _avisos = avisos
+
+
+def _procesar_particion(numero, df, meses, motor):
+    # El avance del motor en la partición vuelve al proceso principal por
+    # la cola, solo cuando cambia
+    ultimo = [-1]
+
+    def avisar(value):
+        if _avisos is not None and value != ultimo[0]:
+            ultimo[0] = value
+            _avisos.put((numero, value))
+
+    df_redistribuido = MOTORES[motor](df, meses, avisar)
+    # Índices originales en el mismo orden en que el motor devuelve las filas
+    indices = np.sort(df.index[df['micro red'].notna()].to_numpy())
+    return indices, df_redistribuido
+
+
+def particionar_por_grupo(df, particiones):
+    # Cada fila solo depende de los donantes de su (codigo, tipo), así que
+    # los grupos se reparten enteros entre particiones; los más grandes
+    # primero y en ronda para equilibrar el tamaño
+    grupos = df.groupby(['codigo', 'tipo'], sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    tamanos = np.bincount(grupos)
+    particiones = max(min(particiones, len(tamanos)), 1)
+
+    particion_de_grupo = np.empty(len(tamanos), dtype=np.int64)
+    particion_de_grupo[np.argsort(-tamanos, kind='stable')] = np.arange(len(tamanos)) % particiones
+    particion_de_fila = particion_de_grupo[grupos]
+
+    return [np.flatnonzero(particion_de_fila == particion) for particion in range(particiones)]
+
+
+def redistribuir_en_paralelo(df, meses, progress_callback, motor, workers):
+    _preparar_columnas(df)
+    if len(df) == 0:
+        return MOTORES[motor](df, meses, progress_callback)
+
+    # _preparar_columnas deja la micro red como categórica en orden de
+    # aparición: cada partición conserva ese orden, y el motor por índice la
+    # recorre igual que en secuencial
+    particiones = particionar_por_grupo(df, workers * PARTICIONES_POR_WORKER)
+    tamanos = np.array([len(posiciones) for posiciones in particiones])
+    # Porcentaje de cada partición; el total se pondera por sus filas
+    avance = np.zeros(len(particiones))
+    resultados = []
+
+    avisos = multiprocessing.Queue()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(avisos,))
+    try:
+        futuros = {
+            executor.submit(_procesar_particion, numero, df.iloc[posiciones], meses, motor): numero
+            for numero, posiciones in enumerate(particiones) if len(posiciones) > 0
+        }
+        pendientes = set(futuros)
+        while pendientes:
+            terminados, pendientes = wait(pendientes, timeout=SEGUNDOS_ENTRE_AVISOS, return_when=FIRST_COMPLETED)
+            while True:
+                try:
+                    numero, value = avisos.get_nowait()
+                except queue.Empty:
+                    break
+                avance[numero] = max(avance[numero], value)
+            for futuro in terminados:
+                resultados.append(futuro.result())
+                avance[futuros[futuro]] = 100
+            # También en cada revisión sin avisos: el callback es donde se cancela
+            progress_callback(int(tamanos @ avance / tamanos.sum()))
+    finally:
+        # Si se cancela o falla una partición, las que esperan en cola se
+        # cancelan y las que ya están corriendo se esperan hasta que terminen
+        executor.shutdown(wait=True, cancel_futures=True)
+        avisos.close()
+
+    indices = np.concatenate([indices for indices, _ in resultados])
+    df_redistribuido = pd.concat([resultado for _, resultado in resultados], ignore_index=True)
+    df_redistribuido = df_redistribuido.iloc[np.argsort(indices, kind='stable')].reset_index(drop=True)
+    # Si las particiones trajeron categorías distintas, concat las dejó como texto
+    categorizar(df_redistribuido, COLUMNAS_SALIDA_CATEGORICAS)
+
+    return df_redistribuido
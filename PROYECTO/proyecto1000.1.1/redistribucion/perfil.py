@@ -0,0 +1,197 @@
+import contextlib
+import cProfile
+import datetime
+import functools
+import importlib.util
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+# REDISTRIBUCION_PERFIL=cprofile (o 1) o =pyinstrument captura además un
+# perfil completo de cada corrida medida
+VARIABLE_PERFIL = 'REDISTRIBUCION_PERFIL'
+CPROFILE = 'cprofile'
+PYINSTRUMENT = 'pyinstrument'
+FUNCIONES_EN_INFORME = 30
+
+# Medición activa del hilo: la GUI mide en el hilo del worker y la
+# librería registra sus etapas sin recibir la medición como argumento
+_hilo = threading.local()
+
+
+def perfilador_configurado():
+    valor = os.environ.get(VARIABLE_PERFIL, '').strip().lower()
+    if valor in ('', '0', 'no'):
+        return None
+    return PYINSTRUMENT if valor == PYINSTRUMENT else CPROFILE
+
+
+def carpeta_informes():
+    return os.environ.get('REDISTRIBUCION_INFORMES',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'redistribucion', 'informes'))
+
+
+class Medicion:
+    # Segundos por etapa de una corrida, en el orden en que empiezan; las
+    # etapas anidadas se nombran "padre/hija". `datos` guarda el contexto
+    # (archivo, filas, motor) que acompaña al informe.
+
+    def __init__(self, nombre, perfilador=None):
+        self.nombre = nombre
+        self.perfilador = perfilador
+        self.inicio = datetime.datetime.now()
+        self.etapas = {}
+        self.datos = {}
+        self.segundos = 0.0
+        self.perfil = None
+        self._estadisticas = None
+        self._pila = []
+        self._abierta = False
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        self._pila.append(nombre)
+        nombre_completo = '/'.join(self._pila)
+        # Se anota al empezar para que la etapa quede antes que sus hijas
+        self.etapas.setdefault(nombre_completo, 0.0)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._pila.pop()
+            self.etapas[nombre_completo] = self.etapas.get(nombre_completo, 0.0) + segundos
+            # Una etapa agregada después de cerrar la medición (p. ej. mostrar
+            # la tabla en la GUI) suma al total
+            if not self._abierta and not self._pila:
+                self.segundos += segundos
+
+    def total(self):
+        return self.segundos
+
+    def a_dict(self):
+        total = self.total()
+        return {
+            'nombre': self.nombre,
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'total': round(total, 6),
+            'datos': self.datos,
+            'etapas': [{'etapa': etapa, 'segundos': round(segundos, 6),
+                        'porcentaje': round(100 * segundos / total, 1) if total else 0.0}
+                       for etapa, segundos in self.etapas.items()],
+            'perfilador': self.perfilador,
+        }
+
+    def tabla(self):
+        # Informe legible: una línea por etapa, sangrada según su nivel
+        total = self.total()
+        nombres = ['  ' * etapa.count('/') + etapa.rsplit('/', 1)[-1] for etapa in self.etapas]
+        ancho = max([len(nombre) for nombre in nombres] + [len('total'), len('etapa')])
+        lineas = [f"{'etapa':<{ancho}}  {'segundos':>9}  {'%':>5}"]
+        for nombre, segundos in zip(nombres, self.etapas.values()):
+            porcentaje = 100 * segundos / total if total else 0.0
+            lineas.append(f"{nombre:<{ancho}}  {segundos:9.3f}  {porcentaje:5.1f}")
+        lineas.append(f"{'total':<{ancho}}  {total:9.3f}  {100.0 if total else 0.0:5.1f}")
+        return "\n".join(lineas)
+
+    def resumen(self, maximo=4):
+        # Las etapas de primer nivel que más tardaron, en una línea
+        primeras = [(etapa, segundos) for etapa, segundos in self.etapas.items() if '/' not in etapa]
+        primeras.sort(key=lambda item: item[1], reverse=True)
+        return ", ".join(f"{etapa} {segundos:.2f} s" for etapa, segundos in primeras[:maximo])
+
+    def guardar(self, archivo):
+        # `archivo` es la ruta del JSON; al lado quedan la tabla (.txt) y,
+        # si se capturó, el perfil (.prof de cProfile o .perfil.txt)
+        try:
+            base, _ = os.path.splitext(archivo)
+            carpeta = os.path.dirname(archivo)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            with open(archivo, 'w', encoding='utf-8') as f:
+                json.dump(self.a_dict(), f, ensure_ascii=False, indent=2)
+            with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+                f.write(self.tabla() + "\n")
+                if self.perfil:
+                    f.write("\n" + self.perfil)
+            if self._estadisticas is not None:
+                self._estadisticas.dump_stats(f"{base}.prof")
+            return True
+        except Exception as e:
+            print(f"Error al guardar el informe de tiempos: {e}")
+            return False
+
+    def guardar_en_carpeta(self, carpeta=None):
+        nombre = f"{self.inicio:%Y%m%d-%H%M%S}-{self.nombre}.json".replace(' ', '_')
+        archivo = os.path.join(carpeta or carpeta_informes(), nombre)
+        return archivo if self.guardar(archivo) else None
+
+
+def _iniciar_perfil(perfilador):
+    if perfilador == PYINSTRUMENT:
+        if importlib.util.find_spec('pyinstrument') is not None:
+            from pyinstrument import Profiler
+
+            perfil = Profiler()
+            perfil.start()
+            return perfil
+        print("pyinstrument no está instalado; se usa cProfile.")
+    if perfilador is not None:
+        perfil = cProfile.Profile()
+        perfil.enable()
+        return perfil
+    return None
+
+
+def _detener_perfil(medicion, perfil):
+    if isinstance(perfil, cProfile.Profile):
+        perfil.disable()
+        salida = io.StringIO()
+        estadisticas = pstats.Stats(perfil, stream=salida)
+        estadisticas.sort_stats('cumulative').print_stats(FUNCIONES_EN_INFORME)
+        medicion._estadisticas = estadisticas
+        medicion.perfil = salida.getvalue()
+    elif perfil is not None:
+        perfil.stop()
+        medicion.perfil = perfil.output_text()
+
+
+@contextlib.contextmanager
+def medir(nombre, perfilador=None):
+    # Activa una medición en este hilo durante el bloque: las etapas de la
+    # librería se registran en ella
+    medicion = Medicion(nombre, perfilador)
+    anterior = getattr(_hilo, 'medicion', None)
+    _hilo.medicion = medicion
+    medicion._abierta = True
+    perfil = _iniciar_perfil(perfilador)
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        medicion.segundos = time.perf_counter() - inicio
+        _detener_perfil(medicion, perfil)
+        medicion._abierta = False
+        _hilo.medicion = anterior
+
+
+def etapa(nombre):
+    # Cronómetro de una etapa de la medición activa; sin medición no hace nada
+    medicion = getattr(_hilo, 'medicion', None)
+    if medicion is None:
+        return contextlib.nullcontext()
+    return medicion.etapa(nombre)
+
+
+def medido(nombre):
+    # Decorador: la función entera es una etapa
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            with etapa(nombre):
+                return funcion(*args, **kwargs)
+        return medida
+    return decorador
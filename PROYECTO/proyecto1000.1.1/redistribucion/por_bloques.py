@@ -0,0 +1,395 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from . import formatos
+from .esquema import COLUMNAS_REQUERIDAS, ESQUEMA, MESES, NUMERO, tipo_compacto
+from .excel import COLUMNAS_TEXTO, _bloques_de_filas, leer_encabezado
+from .motor import (_armar_resultado, _demanda_en_forma_cerrada, _preparar_columnas, _recibido_en_forma_cerrada,
+                    resultado_para_presentacion)
+from .perfil import etapa, medido
+
+# Filas que se leen, calculan y escriben por vez. La memoria depende de este
+# número y de la cantidad de (codigo, tipo) y de establecimientos, no del
+# largo del libro.
+FILAS_POR_BLOQUE = 20000
+# Caché de páginas de la base temporal, en KiB
+CACHE_SQLITE_KIB = 16384
+# Último donante de un grupo que todavía no tiene donantes (como en _donantes_por_fila)
+SIN_DONANTE = -2
+
+
+def _sin_progreso(value):
+    pass
+
+
+def _a_dataframe(filas, posiciones):
+    datos = {}
+    for nombre, i in posiciones.items():
+        valores = [fila[i] if i < len(fila) else None for fila in filas]
+        if nombre in COLUMNAS_TEXTO:
+            # Como al importar con dtype=str: los números de estas columnas pasan a texto
+            valores = [None if valor is None else str(valor) for valor in valores]
+        if ESQUEMA.get(nombre) == NUMERO:
+            datos[nombre] = valores
+        else:
+            # Sin inferir el tipo por bloque: un código vacío no vuelve
+            # decimales los demás códigos del bloque
+            datos[nombre] = pd.Series(valores, dtype=object)
+    return pd.DataFrame(datos)
+
+
+def _leer_bloques(archivo, columnas, filas_por_bloque):
+    # openpyxl en modo solo lectura recorre la hoja fila a fila sin cargarla
+    # (calamine, en cambio, la carga entera). Entrega cada bloque con las
+    # columnas pedidas, en minúsculas, y la fracción del libro ya leída.
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = max((hoja.max_row or 0) - 1, 1)
+        filas = hoja.iter_rows(values_only=True)
+        posiciones = {}
+        for i, columna in enumerate(next(filas, ())):
+            nombre = None if columna is None else str(columna).lower()
+            if nombre in columnas and nombre not in posiciones:
+                posiciones[nombre] = i
+
+        bloque = []
+        leidas = 0
+        for fila in filas:
+            leidas += 1
+            # Las filas vacías no tienen micro red ni stock: no cuentan en ningún grupo
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append(fila)
+            if len(bloque) == filas_por_bloque:
+                yield _a_dataframe(bloque, posiciones), min(leidas / total, 1.0)
+                bloque = []
+        if bloque:
+            yield _a_dataframe(bloque, posiciones), 1.0
+    finally:
+        libro.close()
+
+
+def _representantes(valores):
+    # Los pocos valores de un bloque que deciden tipo_compacto: un vacío, un
+    # no finito, un decimal y el mayor valor absoluto. tipo_compacto sobre
+    # los representantes de todos los bloques da lo mismo que sobre la columna.
+    presentes = valores[~np.isnan(valores)]
+    representantes = [np.nan] if len(presentes) < len(valores) else []
+    finitos = presentes[np.isfinite(presentes)]
+    representantes += presentes[~np.isfinite(presentes)][:1].tolist()
+    representantes += finitos[finitos != np.round(finitos)][:1].tolist()
+    if len(finitos):
+        representantes.append(np.abs(finitos).max())
+    return representantes
+
+
+class TiposDelLibro:
+    # Una corrida completa decide el tipo de cada columna mirando el libro
+    # entero; por bloques se decidiría con cada bloque (un código vacío en un
+    # solo bloque vuelve decimales todos los códigos del libro, y el CSV los
+    # escribe como "10000.0"). La primera pasada observa todos los bloques y
+    # la segunda lleva cada uno a los tipos de la corrida completa.
+
+    def __init__(self):
+        self.numeros = {}
+        # Columnas leídas sin esquema: [solo números, con vacíos, con decimales]
+        self.otras = {}
+
+    def observar(self, df):
+        for columna in df.columns:
+            if columna in COLUMNAS_TEXTO:
+                continue
+            if ESQUEMA.get(columna) == NUMERO:
+                valores = pd.to_numeric(df[columna], errors='coerce').to_numpy(dtype=float)
+                self.numeros.setdefault(columna, []).extend(_representantes(valores))
+                continue
+            resumen = self.otras.setdefault(columna, [True, False, False])
+            for valor in df[columna].tolist():
+                if valor is None or valor != valor:
+                    resumen[1] = True
+                elif isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                    resumen[0] = False
+                elif isinstance(valor, float) and not valor.is_integer():
+                    resumen[2] = True
+
+    def aplicar_leidas(self, df):
+        # Antes del esquema: como pandas al leer la columna entera, enteros
+        # si no hay vacíos ni decimales y si no float64
+        for columna, (solo_numeros, con_vacios, con_decimales) in self.otras.items():
+            if columna in df.columns and solo_numeros:
+                df[columna] = df[columna].astype(np.float64 if con_vacios or con_decimales else np.int64)
+
+    def aplicar_numeros(self, df):
+        # Después del esquema: el tipo compacto de la columna entera
+        for columna, representantes in self.numeros.items():
+            if columna in df.columns:
+                df[columna] = df[columna].astype(tipo_compacto(np.array(representantes, dtype=float)))
+
+
+class AgregadosDonantes:
+    # Lo que el motor vectorizado necesita de todo el libro, juntado en una
+    # primera pasada: por (codigo, tipo), el stock y la cantidad de donantes,
+    # el último donante y el último de otro establecimiento. Los totales por
+    # (codigo, tipo, establecimiento) crecen con el libro y van a una base
+    # SQLite temporal en disco; en memoria solo quedan los grupos y los
+    # nombres de establecimiento, numerados en orden de aparición.
+
+    def __init__(self, carpeta):
+        self.grupos = {}
+        self.establecimientos = {}
+        self.stock = []
+        self.donantes = []
+        self.ultimo = []
+        self.penultimo = []
+        self.filas = 0
+        self.conexion = sqlite3.connect(os.path.join(carpeta, 'donantes.sqlite'))
+        self.conexion.executescript(f"""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            PRAGMA cache_size = -{CACHE_SQLITE_KIB};
+            CREATE TABLE donantes (grupo INTEGER, establecimiento INTEGER, stock REAL, cantidad INTEGER,
+                                   PRIMARY KEY (grupo, establecimiento)) WITHOUT ROWID;
+            CREATE TEMP TABLE consulta (fila INTEGER PRIMARY KEY, grupo INTEGER, establecimiento INTEGER);
+        """)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def _numerar(self, valores, validos, numeros, agregar):
+        if agregar:
+            return np.array([numeros.setdefault(valor, len(numeros)) if valido else -1
+                             for valor, valido in zip(valores, validos)], dtype=np.int64)
+        return np.array([numeros.get(valor, -1) if valido else -1
+                         for valor, valido in zip(valores, validos)], dtype=np.int64)
+
+    def _grupos(self, df, agregar=False):
+        # (codigo, tipo) de cada fila como entero; -1 si falta alguno
+        validos = (df['codigo'].notna() & df['tipo'].notna()).tolist()
+        claves = zip(df['codigo'].tolist(), df['tipo'].tolist())
+        return self._numerar(claves, validos, self.grupos, agregar)
+
+    def agregar(self, df):
+        grupos = self._grupos(df, agregar=True)
+        establecimientos = self._numerar(df['establecimiento'].tolist(), df['establecimiento'].notna().tolist(),
+                                         self.establecimientos, agregar=True)
+        stock = pd.to_numeric(df['stock'], errors='coerce').to_numpy(dtype=float)
+        nuevos = len(self.grupos) - len(self.stock)
+        self.stock += [0.0] * nuevos
+        self.donantes += [0] * nuevos
+        self.ultimo += [SIN_DONANTE] * nuevos
+        self.penultimo += [SIN_DONANTE] * nuevos
+        self.filas += len(df)
+
+        filas = np.flatnonzero((grupos >= 0) & (stock > 0))
+        for grupo, establecimiento, cantidad in zip(grupos[filas].tolist(), establecimientos[filas].tolist(),
+                                                    stock[filas].tolist()):
+            self.stock[grupo] += cantidad
+            self.donantes[grupo] += 1
+            # El penúltimo es el último donante que no es del establecimiento
+            # del último (uno sin nombre nunca coincide)
+            ultimo = self.ultimo[grupo]
+            if establecimiento < 0:
+                self.penultimo[grupo] = establecimiento
+            elif ultimo != SIN_DONANTE and (ultimo != establecimiento or ultimo < 0):
+                self.penultimo[grupo] = ultimo
+            self.ultimo[grupo] = establecimiento
+
+        con_nombre = filas[establecimientos[filas] >= 0]
+        pares = pd.DataFrame({'grupo': grupos[con_nombre], 'establecimiento': establecimientos[con_nombre],
+                              'stock': stock[con_nombre]})
+        pares = pares.groupby(['grupo', 'establecimiento']).agg(stock=('stock', 'sum'), cantidad=('stock', 'size'))
+        pares = pares.reset_index()
+        self.conexion.executemany(
+            "INSERT INTO donantes VALUES (?, ?, ?, ?) ON CONFLICT (grupo, establecimiento) DO UPDATE "
+            "SET stock = stock + excluded.stock, cantidad = cantidad + excluded.cantidad",
+            zip(*(pares[columna].tolist() for columna in pares.columns))
+        )
+
+    def terminar(self):
+        self.conexion.commit()
+        self.stock = np.array(self.stock, dtype=float)
+        self.donantes = np.array(self.donantes, dtype=np.int64)
+        self.ultimo = np.array(self.ultimo, dtype=np.int64)
+        self.penultimo = np.array(self.penultimo, dtype=np.int64)
+        self.categorias = pd.Index(list(self.establecimientos))
+
+    def categorizar_establecimientos(self, serie):
+        # Con las categorías de todo el libro, el código de categoría de cada
+        # bloque es el mismo número de la primera pasada
+        return pd.Categorical(serie, categories=self.categorias)
+
+    def _propios(self, grupos, establecimientos):
+        # Stock y cantidad de donantes del mismo (codigo, tipo, establecimiento)
+        stock = np.zeros(len(grupos))
+        cantidad = np.zeros(len(grupos), dtype=np.int64)
+        filas = np.flatnonzero((grupos >= 0) & (establecimientos >= 0))
+        self.conexion.execute("DELETE FROM consulta")
+        self.conexion.executemany("INSERT INTO consulta VALUES (?, ?, ?)",
+                                  zip(filas.tolist(), grupos[filas].tolist(), establecimientos[filas].tolist()))
+        encontrados = self.conexion.execute(
+            "SELECT c.fila, d.stock, d.cantidad FROM consulta c "
+            "JOIN donantes d ON d.grupo = c.grupo AND d.establecimiento = c.establecimiento"
+        ).fetchall()
+        if encontrados:
+            posiciones, stocks, cantidades = zip(*encontrados)
+            posiciones = np.array(posiciones, dtype=np.int64)
+            stock[posiciones] = stocks
+            cantidad[posiciones] = cantidades
+        return stock, cantidad
+
+    def donantes_por_fila(self, df):
+        # Lo mismo que _donantes_por_fila sobre el libro entero, para las
+        # filas de un bloque con los establecimientos ya categorizados
+        grupos = self._grupos(df)
+        establecimientos = df['establecimiento'].cat.codes.to_numpy().astype(np.int64)
+        stock_propio, donantes_propios = self._propios(grupos, establecimientos)
+
+        con_grupo = grupos >= 0
+        grupo = np.where(con_grupo, grupos, 0)
+        donantes_otros = np.where(con_grupo, self.donantes[grupo], 0) - donantes_propios
+        stock_otros = np.where(donantes_otros > 0, np.where(con_grupo, self.stock[grupo], 0.0) - stock_propio, 0.0)
+        stock_otros = np.maximum(stock_otros, 0.0)
+
+        ultimo = np.where(con_grupo, self.ultimo[grupo], SIN_DONANTE)
+        usar_ultimo = (establecimientos != ultimo) | (establecimientos < 0)
+        destino = np.where(usar_ultimo, ultimo, self.penultimo[grupo])
+        return stock_otros, donantes_otros, destino
+
+
+class _Escritura:
+    # Escribe el resultado bloque a bloque sin juntarlo: XLSX con xlsxwriter
+    # en modo de memoria constante (u openpyxl en modo solo escritura) y CSV
+    # agregando al final del archivo
+
+    def __init__(self, archivo, formato, separador=','):
+        self.archivo = archivo
+        self.formato = formato
+        self.separador = separador
+        self.xlsxwriter = importlib.util.find_spec('xlsxwriter') is not None
+        self.destino = None
+        self.hoja = None
+        self.numero_fila = 0
+
+    def __enter__(self):
+        if self.formato == formatos.FORMATO_CSV:
+            self.destino = open(self.archivo, 'w', encoding='utf-8', newline='')
+        elif self.xlsxwriter:
+            import xlsxwriter
+
+            self.destino = xlsxwriter.Workbook(self.archivo, {'constant_memory': True})
+            self.hoja = self.destino.add_worksheet()
+        else:
+            from openpyxl import Workbook
+
+            self.destino = Workbook(write_only=True)
+            self.hoja = self.destino.create_sheet()
+        return self
+
+    def _escribir_fila(self, fila):
+        if self.xlsxwriter:
+            self.hoja.write_row(self.numero_fila, 0, fila)
+        else:
+            self.hoja.append(list(fila))
+        self.numero_fila += 1
+
+    def escribir(self, df):
+        encabezado = self.numero_fila == 0
+        if self.formato == formatos.FORMATO_CSV:
+            df.to_csv(self.destino, sep=self.separador, index=False, header=encabezado)
+            self.numero_fila += len(df) + encabezado
+            return
+        if encabezado:
+            self._escribir_fila([str(columna) for columna in df.columns])
+        for _, bloque in _bloques_de_filas(df, np.arange(len(df))):
+            for fila in bloque:
+                self._escribir_fila(fila)
+
+    def __exit__(self, *excepcion):
+        if self.formato == formatos.FORMATO_CSV or self.xlsxwriter:
+            self.destino.close()
+        else:
+            self.destino.save(self.archivo)
+        return False
+
+
+def _redistribuir_bloque(df, meses, agregados, tipos, inicio):
+    # El motor vectorizado sobre un bloque, con los donantes y los tipos de
+    # columna de todo el libro
+    df.index = pd.RangeIndex(inicio, inicio + len(df))
+    tipos.aplicar_leidas(df)
+    df['establecimiento'] = agregados.categorizar_establecimientos(df['establecimiento'])
+    _preparar_columnas(df)
+    tipos.aplicar_numeros(df)
+
+    abastecimiento = _demanda_en_forma_cerrada(df, meses)
+    stock_otros, donantes_otros, destino = agregados.donantes_por_fila(df)
+    stock_a_recibir, destino = _recibido_en_forma_cerrada(abastecimiento, stock_otros, donantes_otros, destino)
+    return _armar_resultado(df, abastecimiento, stock_a_recibir, destino)
+
+
+@medido('redistribuir por bloques')
+def redistribuir_por_bloques(entrada, salida, meses=None, progress_callback=None,
+                             filas_por_bloque=FILAS_POR_BLOQUE, separador=','):
+    # Redistribuye un libro sin cargarlo entero, con el mismo resultado que
+    # el motor vectorizado. Leer el XLSX es lo más lento, así que se lee una
+    # sola vez: cada bloque suma a los agregados de donantes y queda en un
+    # archivo temporal, que la segunda pasada calcula y escribe en `salida`
+    # (.xlsx o .csv), en el orden del libro.
+    try:
+        progress_callback = progress_callback or _sin_progreso
+        formato = formatos.formato_de_archivo(salida)
+        if formato not in (formatos.FORMATO_XLSX, formatos.FORMATO_CSV):
+            print("La redistribución por bloques escribe solo .xlsx o .csv.")
+            return False
+
+        encabezado = [str(columna).lower() for columna in leer_encabezado(entrada)]
+        missing_columns = [col for col in COLUMNAS_REQUERIDAS if col not in encabezado]
+        if missing_columns:
+            print(f"Faltan las columnas: {', '.join(missing_columns)}")
+            return False
+        meses = [mes for mes in (meses or MESES) if mes in encabezado]
+        if not meses:
+            print("No hay meses válidos para redistribuir el stock.")
+            return False
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            agregados = AgregadosDonantes(carpeta)
+            tipos = TiposDelLibro()
+            try:
+                bloques = []
+                with etapa('leer y agregar donantes'):
+                    columnas = set(COLUMNAS_REQUERIDAS) | set(meses)
+                    for df, leido in _leer_bloques(entrada, columnas, filas_por_bloque):
+                        agregados.agregar(df)
+                        tipos.observar(df)
+                        bloques.append(os.path.join(carpeta, f"bloque{len(bloques)}.pkl"))
+                        df.to_pickle(bloques[-1])
+                        progress_callback(int(leido * 70))
+                    agregados.terminar()
+
+                inicio = 0
+                with etapa('calcular y escribir'), _Escritura(salida, formato, separador) as escritura:
+                    for numero, bloque in enumerate(bloques, 1):
+                        df = pd.read_pickle(bloque)
+                        os.remove(bloque)
+                        df_redistribuido = _redistribuir_bloque(df, meses, agregados, tipos, inicio)
+                        escritura.escribir(resultado_para_presentacion(df_redistribuido))
+                        inicio += len(df)
+                        progress_callback(70 + int(numero / len(bloques) * 30))
+            finally:
+                agregados.cerrar()
+
+        progress_callback(100)
+        print(f"Archivo exportado correctamente a: {salida} ({agregados.filas} filas leídas)")
+        return True
+    except Exception as e:
+        print(f"Error al redistribuir por bloques: {e}")
+        return False
@@ -0,0 +1,105 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class ModeloTabla(QAbstractTableModel):
+    # Modelo de solo lectura sobre un DataFrame: guarda los arreglos NumPy
+    # de cada columna y formatea el valor recién cuando la vista pide la
+    # celda, así que solo cuestan las celdas visibles. Los filtros solo
+    # cambian el arreglo de filas visibles; los datos no se copian. NumPy
+    # y pandas se importan recién al cargar datos: la ventana crea el modelo
+    # vacío al arrancar.
+
+    def __init__(self, df=None, parent=None):
+        super().__init__(parent)
+        self._columnas = []
+        self._nulos = []
+        self._textos_nulos = []
+        self._filas_con_texto = None
+        self._encabezados = []
+        self._filas = 0
+        self._visibles = None
+        if df is not None:
+            self.set_dataframe(df)
+
+    def set_dataframe(self, df, columnas=None, textos_nulos=None, filas_con_texto=None):
+        # `textos_nulos` indica qué mostrar en las celdas nulas de las
+        # columnas numéricas con nulos (Int64/Float64), p. ej. {"STOCK FINAL": "SC"};
+        # con `filas_con_texto` (arreglo booleano por fila) el texto va solo en
+        # esas filas y las demás celdas nulas quedan vacías
+        import numpy as np
+        import pandas as pd
+
+        columnas = list(df.columns) if columnas is None else columnas
+        textos_nulos = textos_nulos or {}
+        self.beginResetModel()
+        self._encabezados = [str(columna) for columna in columnas]
+        self._columnas = []
+        self._nulos = []
+        self._textos_nulos = []
+        for columna in columnas:
+            serie = df[columna]
+            if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and serie.dtype.kind in 'iuf':
+                # NaN y NA se muestran igual
+                self._columnas.append(serie.to_numpy(dtype=float, na_value=np.nan))
+                self._nulos.append(np.isnan(self._columnas[-1]))
+            else:
+                self._columnas.append(serie.to_numpy())
+                self._nulos.append(None)
+            self._textos_nulos.append(textos_nulos.get(columna, ''))
+        self._filas_con_texto = filas_con_texto
+        self._filas = len(df)
+        self._visibles = None
+        self.endResetModel()
+
+    def filtrar(self, mascara):
+        # `mascara` es un arreglo booleano sobre todas las filas; None quita el filtro
+        import numpy as np
+
+        self.beginResetModel()
+        self._visibles = None if mascara is None else np.flatnonzero(mascara)
+        self.endResetModel()
+
+    def limpiar_filtro(self):
+        self.filtrar(None)
+
+    def filas_visibles(self):
+        import numpy as np
+
+        if self._visibles is None:
+            return np.arange(self._filas)
+        return self._visibles
+
+    def fila_original(self, fila):
+        return fila if self._visibles is None else int(self._visibles[fila])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._filas if self._visibles is None else len(self._visibles)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columnas)
+
+    def valor(self, fila, columna):
+        fila = self.fila_original(fila)
+        nulos = self._nulos[columna]
+        if nulos is not None and nulos[fila]:
+            return None
+        return self._columnas[columna][fila]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        valor = self.valor(index.row(), index.column())
+        if valor is None and self._nulos[index.column()] is not None:
+            if self._filas_con_texto is not None and not self._filas_con_texto[self.fila_original(index.row())]:
+                return ''
+            return self._textos_nulos[index.column()]
+        return str(valor)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._encabezados[section]
+        return str(self.fila_original(section) + 1)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_libro
+from redistribucion.esquema import MESES
+from redistribucion.motor import COLUMNA_SIN_CAMBIO, redistribuir_stock, resultado_para_presentacion
+
+
+def sin_progreso(value):
+    pass
+
+
+def fila(micro_red, establecimiento, codigo, stock, salidas, tipo='M', precio=2.0, cpa=5):
+    valores = {'micro red': micro_red, 'codigo_est': 1, 'establecimiento': establecimiento, 'codigo': codigo,
+               'medicamentos': f"MEDICAMENTO {codigo}", 'precio': precio, 'siga': 'SIGA', 'tipo': tipo,
+               'petitorio': '_', 'estrategico': '_', 'stock': stock, 'total': 0, 'cant_sin_ceros': 0,
+               'cpa': cpa, 'disponibilidad': 1.0}
+    valores.update(zip(MESES, salidas))
+    return valores
+
+
+def libro(*filas):
+    return pd.DataFrame(list(filas))
+
+
+def primeros_meses(*salidas):
+    return list(salidas) + [0] * (len(MESES) - len(salidas))
+
+
+def redistribuir(df, motor, progress_callback=sin_progreso, **opciones):
+    return redistribuir_stock(df.copy(), MESES, progress_callback, motor=motor, **opciones)
+
+
+def libro_con_bordes(semilla, micro_redes=2, establecimientos=4, medicamentos=25):
+    # Un libro generado con lo que aparece en las planillas reales: meses
+    # vacíos y negativos, filas sin establecimiento, código, tipo o micro
+    # red, sin cpa o precio, stock en cero o negativo y filas repetidas
+    rng = np.random.default_rng(semilla)
+    df = generar_libro(micro_redes, establecimientos, medicamentos, semilla=semilla)
+    df = pd.concat([df, df.sample(10, random_state=semilla)], ignore_index=True)
+    df = df.astype({'micro red': object, 'establecimiento': object, 'codigo': object, 'tipo': object})
+    df = df.astype({mes: float for mes in MESES} | {'stock': float, 'cpa': float})
+    filas = len(df)
+    for columna in ['micro red', 'establecimiento', 'codigo', 'tipo']:
+        df.loc[rng.choice(filas, 5, replace=False), columna] = None
+    for columna in ['cpa', 'precio']:
+        df.loc[rng.choice(filas, 5, replace=False), columna] = np.nan
+    for mes in rng.choice(MESES, 4, replace=False):
+        df.loc[rng.choice(filas, 3, replace=False), mes] = np.nan
+        df.loc[rng.choice(filas, 3, replace=False), mes] = -rng.integers(1, 20, 3)
+    df.loc[rng.choice(filas, 5, replace=False), 'stock'] = -3
+    return df
+
+
+def valores(df):
+    # Columnas de salida como listas de texto, números o None: los motores
+    # pueden diferir en el tipo de una columna, no en lo que se exporta
+    presentacion = resultado_para_presentacion(df)
+    return {columna: [None if pd.isna(valor) else valor if isinstance(valor, str) else float(valor)
+                      for valor in presentacion[columna]]
+            for columna in presentacion.columns}
+
+
+def comparar_resultados(obtenido, esperado):
+    assert list(obtenido.columns) == list(esperado.columns)
+    assert obtenido[COLUMNA_SIN_CAMBIO].tolist() == esperado[COLUMNA_SIN_CAMBIO].tolist()
+    obtenidos, esperados = valores(obtenido), valores(esperado)
+    for columna in esperados:
+        assert obtenidos[columna] == esperados[columna], columna
@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+
+from redistribucion import incremental
+from redistribucion.esquema import MESES
+from redistribucion.incremental import redistribuir_incremental
+from redistribucion.motor import (MOTOR_INDICE, MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED, MOTOR_PRIORIDAD,
+                                  MOTOR_VECTORIZADO, MOTORES)
+from redistribucion.motores import solver_disponible
+from tests.comun import comparar_resultados, libro_con_bordes, redistribuir, sin_progreso
+
+CON_SOLVER = {MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED}
+CAMBIOS = ['stock', 'mes', 'codigo', 'fila eliminada', 'fila nueva']
+
+
+def correr(monkeypatch, anterior, nuevo, motor):
+    # Corre la incremental, la compara con una corrida completa del libro
+    # nuevo y devuelve si recalculó todo y cuántas filas pasó al motor
+    if motor in CON_SOLVER and not solver_disponible():
+        pytest.skip("el motor necesita scipy")
+    resultado_anterior = redistribuir(anterior, motor)
+    esperado = redistribuir(nuevo, motor)
+
+    completas = []
+    recalculadas = []
+    redistribuir_stock = incremental.redistribuir_stock
+    motor_real = MOTORES[motor]
+
+    def completa(df, *args, **kwargs):
+        completas.append(len(df))
+        return redistribuir_stock(df, *args, **kwargs)
+
+    def parcial(df, *args, **kwargs):
+        recalculadas.append(len(df))
+        return motor_real(df, *args, **kwargs)
+
+    monkeypatch.setattr(incremental, 'redistribuir_stock', completa)
+    monkeypatch.setitem(MOTORES, motor, parcial)
+    resultado = redistribuir_incremental(anterior.copy(), resultado_anterior, nuevo.copy(), MESES, sin_progreso,
+                                         motor=motor)
+    comparar_resultados(resultado, esperado)
+    return bool(completas), recalculadas
+
+
+def editar(df, cambio):
+    df = df.copy()
+    if cambio == 'stock':
+        df.loc[3, 'stock'] += 50
+    elif cambio == 'mes':
+        df.loc[10, MESES[2]] = 99
+    elif cambio == 'codigo':
+        df.loc[20, 'codigo'] = df.loc[0, 'codigo']
+    elif cambio == 'fila eliminada':
+        df = df.drop(index=15)
+    elif cambio == 'fila nueva':
+        nueva = df.loc[[5]].assign(establecimiento='ESTABLECIMIENTO 99')
+        df = pd.concat([df.iloc[:30], nueva, df.iloc[30:]])
+    return df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+@pytest.mark.parametrize("cambio", CAMBIOS)
+def test_filas_editadas_copian_el_resto(monkeypatch, cambio, motor):
+    anterior = libro_con_bordes(4)
+    completa, recalculadas = correr(monkeypatch, anterior, editar(anterior, cambio), motor)
+    assert not completa
+    assert len(recalculadas) == 1
+    assert 0 < recalculadas[0] < len(anterior) // 4
+
+
+@pytest.mark.parametrize("motor", [MOTOR_VECTORIZADO, MOTOR_INDICE])
+def test_sin_cambios_copia_todo(monkeypatch, motor):
+    anterior = libro_con_bordes(4)
+    completa, recalculadas = correr(monkeypatch, anterior, anterior.copy(), motor)
+    assert not completa
+    assert recalculadas == [0]
+
+
+@pytest.mark.parametrize("motor", [MOTOR_VECTORIZADO, MOTOR_PRIORIDAD])
+def test_filas_reordenadas_recalculan_todo(monkeypatch, motor):
+    anterior = libro_con_bordes(4)
+    nuevo = anterior.sample(frac=1, random_state=0).reset_index(drop=True)
+    completa, _ = correr(monkeypatch, anterior, nuevo, motor)
+    assert completa
+
+
+@pytest.mark.parametrize("cambio", ['columna nueva', 'columna quitada'])
+def test_columnas_cambiadas_recalculan_todo(monkeypatch, cambio):
+    anterior = libro_con_bordes(4)
+    if cambio == 'columna nueva':
+        nuevo = anterior.assign(observaciones='revisado')
+    else:
+        nuevo = anterior.drop(columns=['siga'])
+    completa, _ = correr(monkeypatch, anterior, nuevo, MOTOR_VECTORIZADO)
+    assert completa
+
+
+@pytest.mark.parametrize("motor, recalcula_todo", [(MOTOR_VECTORIZADO, False), (MOTOR_INDICE, True),
+                                                   (MOTOR_PRIORIDAD, True)])
+def test_orden_de_micro_redes(monkeypatch, motor, recalcula_todo):
+    # La primera fila pasa a la segunda micro red, que ahora aparece
+    # primero: solo importa a los motores que descuentan lo entregado
+    anterior = libro_con_bordes(4)
+    anterior.loc[0, 'micro red'] = 'MICRO RED 1'
+    nuevo = anterior.copy()
+    nuevo.loc[0, 'micro red'] = 'MICRO RED 2'
+    completa, _ = correr(monkeypatch, anterior, nuevo, motor)
+    assert completa == recalcula_todo
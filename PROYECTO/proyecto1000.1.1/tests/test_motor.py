@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from redistribucion.esquema import MESES, aplicar_esquema
+from redistribucion.motor import (COLUMNA_SIN_CAMBIO, COLUMNAS_STOCK, MARCA_SIN_CAMBIO, MOTOR_CLASICO,
+                                  MOTOR_VECTORIZADO, SIN_EXTRACCION, SIN_TRASPASO)
+from tests.comun import comparar_resultados, fila, libro, libro_con_bordes, primeros_meses, redistribuir, valores
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_vectorizado_igual_al_clasico(semilla):
+    df = libro_con_bordes(semilla)
+    comparar_resultados(redistribuir(df, MOTOR_VECTORIZADO), redistribuir(df, MOTOR_CLASICO))
+
+
+@pytest.mark.parametrize("caso", ['mes negativo', 'mes vacío', 'sin establecimiento', 'sin donantes',
+                                  'donante del mismo establecimiento'])
+def test_casos_de_borde(caso):
+    filas = {
+        'mes negativo': [fila('A', 'E1', 1, 10, primeros_meses(5, -3, 4)), fila('A', 'E2', 1, 20, primeros_meses())],
+        'mes vacío': [fila('A', 'E1', 1, 10, primeros_meses(5, np.nan, 4)), fila('A', 'E2', 1, 20, primeros_meses())],
+        'sin establecimiento': [fila('A', None, 1, 10, primeros_meses(6)), fila('B', None, 1, 4, primeros_meses()),
+                                fila('B', 'E2', 1, 3, primeros_meses(1))],
+        'sin donantes': [fila('A', 'E1', 1, 10, primeros_meses(6)), fila('A', 'E2', 2, 4, primeros_meses())],
+        'donante del mismo establecimiento': [fila('A', 'E1', 1, 10, primeros_meses(6)),
+                                              fila('A', 'E1', 1, 30, primeros_meses())],
+    }[caso]
+    comparar_resultados(redistribuir(libro(*filas), MOTOR_VECTORIZADO), redistribuir(libro(*filas), MOTOR_CLASICO))
+
+
+def test_mes_negativo_se_toma_como_cero():
+    df = libro(fila('A', 'E1', 1, 10, primeros_meses(5, -3, 4)), fila('A', 'E2', 1, 20, primeros_meses()))
+    aplicar_esquema(df)
+    assert df.attrs['salidas_negativas'] == {MESES[1]: 1}
+    assert df[MESES[1]].tolist() == [0, 0]
+
+    resultado = redistribuir(df, MOTOR_VECTORIZADO)
+    assert resultado['STOCK A RECIBIR'].tolist()[0] == 9
+    assert resultado['ESTABLECIMIENTO DE DONDE SE EXTRAE EL STOCK'].tolist() == ['E1', SIN_EXTRACCION]
+
+
+def test_sin_donantes_no_hay_traspaso():
+    resultado = redistribuir(libro(fila('A', 'E1', 1, 10, primeros_meses(6)), fila('A', 'E1', 1, 30, primeros_meses())),
+                             MOTOR_VECTORIZADO)
+    assert resultado['STOCK A RECIBIR'].isna().all()
+    assert set(resultado['ESTABLECIMIENTO A DONDE SE TRASPASA EL STOCK']) == {SIN_TRASPASO}
+
+
+@pytest.mark.parametrize("motor", [MOTOR_CLASICO, MOTOR_VECTORIZADO])
+def test_sc_solo_en_filas_sin_cambio(motor):
+    # Sin cpa pero con TOTAL: STOCK FINAL vacío. Sin precio: recibe con
+    # TOTAL 0, así que es "sin cambio" pero muestra lo recibido
+    df = libro(fila('A', 'E1', 1, 10, primeros_meses(6), cpa=np.nan),
+               fila('A', 'E2', 1, 30, primeros_meses()),
+               fila('A', 'E3', 1, 10, primeros_meses(6), precio=np.nan))
+    resultado = redistribuir(df, motor)
+    assert resultado[COLUMNA_SIN_CAMBIO].tolist() == [False, True, True]
+    assert resultado['TOTAL'].tolist() == [12.0, 0.0, 0.0]
+
+    presentacion = valores(resultado)
+    assert [presentacion[columna][0] for columna in COLUMNAS_STOCK] == [10.0, 6.0, None]
+    assert [presentacion[columna][1] for columna in COLUMNAS_STOCK] == [MARCA_SIN_CAMBIO] * 3
+    assert [presentacion[columna][2] for columna in COLUMNAS_STOCK] == [MARCA_SIN_CAMBIO, 6.0, MARCA_SIN_CAMBIO]
+
+
+def test_tabla_muestra_sc_como_la_exportacion():
+    pytest.importorskip('PyQt5')
+    from PyQt5.QtCore import Qt
+
+    from redistribucion.tabla_qt import ModeloTabla
+
+    df = libro(fila('A', 'E1', 1, 10, primeros_meses(6), cpa=np.nan), fila('A', 'E2', 1, 30, primeros_meses()))
+    resultado = redistribuir(df, MOTOR_VECTORIZADO)
+    modelo = ModeloTabla()
+    columnas = [columna for columna in resultado.columns if columna != COLUMNA_SIN_CAMBIO]
+    modelo.set_dataframe(resultado, columnas, dict.fromkeys(COLUMNAS_STOCK, MARCA_SIN_CAMBIO),
+                         resultado[COLUMNA_SIN_CAMBIO].to_numpy(dtype=bool))
+    final = columnas.index('STOCK FINAL')
+    assert modelo.data(modelo.index(0, final), Qt.DisplayRole) == ''
+    assert modelo.data(modelo.index(1, final), Qt.DisplayRole) == MARCA_SIN_CAMBIO
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+from scipy.optimize import linprog
+
+from benchmarks.generador import generar_libro
+from redistribucion.esquema import MESES, aplicar_esquema
+from redistribucion.motor import MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED
+from redistribucion.optimo import traspasos_optimos
+from tests.comun import fila, libro, primeros_meses, redistribuir
+
+REDES = {
+    'dos micro redes': [
+        fila('A', 'E1', 1, 6, primeros_meses(4, 2)), fila('A', 'E2', 1, 3, primeros_meses()),
+        fila('B', 'E3', 1, 9, primeros_meses()), fila('B', 'E4', 1, 5, primeros_meses(5)),
+    ],
+    'establecimiento en dos micro redes': [
+        fila('A', 'E1', 1, 4, primeros_meses(4)), fila('B', 'E1', 1, 7, primeros_meses()),
+        fila('B', 'E2', 1, 2, primeros_meses(2)), fila('A', 'E3', 1, 0, primeros_meses(8)),
+        fila('C', 'E4', 1, 5, primeros_meses(1)),
+    ],
+    'falta stock': [
+        fila('A', 'E1', 1, 20, primeros_meses(10, 10)), fila('A', 'E2', 1, 3, primeros_meses()),
+        fila('B', 'E3', 1, 4, primeros_meses()), fila('B', 'E4', 1, 1, primeros_meses(1)),
+        fila('A', 'E2', 1, 6, primeros_meses(6), tipo='I'), fila('B', 'E3', 1, 2, primeros_meses(), tipo='I'),
+        fila('A', 'E1', 2, 8, primeros_meses(3)), fila('A', 'E2', 2, 8, primeros_meses(3)),
+    ],
+}
+
+
+def redes():
+    return ([pytest.param(libro(*filas), id=nombre) for nombre, filas in REDES.items()] +
+            [pytest.param(generar_libro(2, 3, 6, semilla=semilla), id=f"generado {semilla}") for semilla in range(3)])
+
+
+def sumar(claves, cantidades):
+    sumas = {}
+    for clave, cantidad in zip(claves, cantidades):
+        sumas[clave] = sumas.get(clave, 0.0) + cantidad
+    return sumas
+
+
+def _filas(df):
+    # Stock y demanda por fila como los arma el motor, sin pasar por _Red
+    df = aplicar_esquema(df.copy())
+    stock = df['stock'].to_numpy(dtype=float)
+    salidas = df[MESES].to_numpy(dtype=float)
+    demanda = np.minimum(np.nansum(salidas, axis=1), stock)
+    pide = (stock > 0) & ~np.isnan(salidas).any(axis=1) & df['micro red'].notna().to_numpy()
+    claves = list(zip(df['codigo'], df['tipo'], df['establecimiento'], df['micro red']))
+    return df, np.where(pide, demanda, 0.0), np.maximum(stock, 0.0), claves
+
+
+def optimo_directo(df):
+    # Lo máximo que se puede atender y lo mínimo que cruza micro redes
+    # atendiendo eso, con un arco por cada par donante-pedido
+    df, demanda, stock, claves = _filas(df)
+    arcos = [(donante, pedido) for pedido in np.flatnonzero(demanda > 0) for donante in np.flatnonzero(stock > 0)
+             if claves[donante][:2] == claves[pedido][:2] and claves[donante][2] != claves[pedido][2]]
+    if not arcos:
+        return 0.0, 0.0
+    a_ub = np.zeros((2 * len(df), len(arcos)))
+    for columna, (donante, pedido) in enumerate(arcos):
+        a_ub[donante, columna] = 1
+        a_ub[len(df) + pedido, columna] = 1
+    b_ub = np.concatenate([stock, demanda])
+    maximo = linprog(-np.ones(len(arcos)), A_ub=a_ub, b_ub=b_ub, method='highs')
+    cruce = np.array([claves[donante][3] != claves[pedido][3] for donante, pedido in arcos], dtype=float)
+    minimo = linprog(cruce, A_ub=np.vstack([a_ub, -np.ones(len(arcos))]),
+                     b_ub=np.concatenate([b_ub, [maximo.fun + 1e-7]]), method='highs')
+    return -maximo.fun, minimo.fun
+
+
+def entre_micro_redes(traspasos):
+    return traspasos['CANTIDAD'][
+        traspasos['MICRO RED ORIGEN'].astype(object) != traspasos['MICRO RED DESTINO'].astype(object)
+    ].sum()
+
+
+@pytest.mark.parametrize("df", redes())
+@pytest.mark.parametrize("preferir_micro_red", [False, True])
+def test_traspasos_respetan_stock_y_demanda(df, preferir_micro_red):
+    filas, demanda, stock, claves = _filas(df)
+    traspasos = traspasos_optimos(df.copy(), MESES, preferir_micro_red)
+    assert (traspasos['CANTIDAD'] > 0).all()
+    origen = traspasos['ESTABLECIMIENTO ORIGEN'].astype(object)
+    destino = traspasos['ESTABLECIMIENTO DESTINO'].astype(object)
+    assert (origen != destino).all()
+
+    # Por (codigo, tipo, establecimiento): lo entregado contra el stock y lo
+    # recibido contra lo pedido
+    disponible = sumar([clave[:3] for clave in claves], stock)
+    pedido = sumar([clave[:3] for clave in claves], demanda)
+    grupo = list(zip(traspasos['COD-MEDICAMENTO'], traspasos['TIPO']))
+    entregado = sumar([g + (o,) for g, o in zip(grupo, origen)], traspasos['CANTIDAD'])
+    recibido = sumar([g + (d,) for g, d in zip(grupo, destino)], traspasos['CANTIDAD'])
+    for clave, cantidad in entregado.items():
+        assert cantidad <= disponible[clave] + 1e-6
+    for clave, cantidad in recibido.items():
+        assert cantidad <= pedido[clave] + 1e-6
+
+
+@pytest.mark.parametrize("df", redes())
+def test_recibido_igual_al_optimo(df):
+    maximo, minimo_cruce = optimo_directo(df)
+    for motor in (MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED):
+        resultado = redistribuir(df, motor)
+        assert resultado['STOCK A RECIBIR'].fillna(0).sum() == pytest.approx(maximo, abs=1e-6)
+
+    traspasos = traspasos_optimos(df.copy(), MESES)
+    traspasos_micro_red = traspasos_optimos(df.copy(), MESES, preferir_micro_red=True)
+    assert traspasos['CANTIDAD'].sum() == pytest.approx(maximo, abs=1e-6)
+    assert traspasos_micro_red['CANTIDAD'].sum() == pytest.approx(maximo, abs=1e-6)
+    assert entre_micro_redes(traspasos_micro_red) <= entre_micro_redes(traspasos) + 1e-6
+    assert entre_micro_redes(traspasos_micro_red) == pytest.approx(minimo_cruce, abs=1e-6)
@@ -0,0 +1,38 @@
+import queue
+
+import pytest
+
+from redistribucion import paralelo
+from redistribucion.esquema import MESES
+from redistribucion.motor import MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED, MOTORES
+from redistribucion.motores import solver_disponible
+from tests.comun import comparar_resultados, libro_con_bordes, redistribuir
+
+CON_SOLVER = {MOTOR_OPTIMO, MOTOR_OPTIMO_MICRO_RED}
+
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_paralelo_igual_al_secuencial(motor):
+    if motor in CON_SOLVER and not solver_disponible():
+        pytest.skip("el motor necesita scipy")
+    df = libro_con_bordes(3)
+    avance = []
+    paralelo_df = redistribuir(df, motor, workers=3, progress_callback=avance.append)
+    comparar_resultados(paralelo_df, redistribuir(df, motor))
+    assert avance == sorted(avance)
+    assert avance[-1] == 100
+
+
+def test_particion_avisa_su_avance(monkeypatch):
+    avisos = queue.Queue()
+    monkeypatch.setattr(paralelo, '_avisos', avisos)
+    df = libro_con_bordes(3)
+    paralelo._procesar_particion(5, df, MESES, 'clasico')
+
+    recibidos = []
+    while not avisos.empty():
+        recibidos.append(avisos.get())
+    assert {numero for numero, _ in recibidos} == {5}
+    valores = [value for _, value in recibidos]
+    assert len(valores) > 2
+    assert valores == sorted(set(valores))
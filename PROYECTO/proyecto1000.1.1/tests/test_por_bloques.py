@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('openpyxl')
+
+from redistribucion.cli import SALIDA_OK, ejecutar
+from tests.comun import libro_con_bordes
+
+
+def celdas(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True)
+    try:
+        return [list(fila) for fila in libro.active.iter_rows(values_only=True)]
+    finally:
+        libro.close()
+
+
+@pytest.fixture(scope='module')
+def entrada(tmp_path_factory):
+    archivo = tmp_path_factory.mktemp('por_bloques') / 'libro.xlsx'
+    libro_con_bordes(5).to_excel(archivo, index=False)
+    return archivo
+
+
+@pytest.mark.parametrize("extension", ['.csv', '.xlsx'])
+@pytest.mark.parametrize("filas_por_bloque", [37, 100000])
+def test_por_bloques_exporta_lo_mismo(tmp_path, entrada, extension, filas_por_bloque):
+    completo = tmp_path / f"completo{extension}"
+    por_bloques = tmp_path / f"por_bloques{extension}"
+    assert ejecutar(str(entrada), str(completo), usar_cache=False)[0] == SALIDA_OK
+    assert ejecutar(str(entrada), str(por_bloques), filas_por_bloque=filas_por_bloque)[0] == SALIDA_OK
+
+    if extension == '.csv':
+        assert por_bloques.read_bytes() == completo.read_bytes()
+    else:
+        assert celdas(por_bloques) == celdas(completo)